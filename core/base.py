@@ -11,6 +11,8 @@ between strings of bytes (and not strings of characters). 2) Added function to
 check for updates in the Github repository.
 2021-03-07: The imp module is deprecated since version 3.4 in favor of
 importlib.
+2026-10-18: Snapshots without SVN use a content-addressed store of column
+files instead of copying all data for every snapshot.
 
 This program is free software: you can redistribute it and/or modify
 it under the terms of the GNU General Public License as published by
@@ -33,6 +35,8 @@ from pathlib import Path
 from threading import Lock
 from importlib.machinery import SourceFileLoader
 from importlib import util
+import io
+import json
 import os
 import re
 import shutil
@@ -44,6 +48,7 @@ if util.find_spec('svn'):
     import svn.admin
 # import framework libs
 from core import framework
+from core import storage
 from core.constants import BANNER
 
 __version__ = ""
@@ -112,7 +117,7 @@ class Computist(framework.Framework):
         )
         self.cache_path = framework.Framework.cache_path
         self.repository_path = framework.Framework.repository_path
-        self.dataframe = framework.Framework.dataframe
+        self._dataframe = framework.Framework._dataframe
 
     def start(self, mode, workspace="default"):
         # initialize framework components
@@ -143,6 +148,12 @@ class Computist(framework.Framework):
             required=True,
             description="number of processes"
         )
+        self.register_option(
+            name="start-method",
+            value=None,
+            required=False,
+            description="worker start method (fork, spawn, forkserver)"
+        )
         self.register_option(
             name="verbosity",
             value=1,
@@ -155,6 +166,42 @@ class Computist(framework.Framework):
             required=True,
             description="socket timeout (seconds)"
         )
+        self.register_option(
+            name="storage",
+            value="feather" if util.find_spec("pyarrow") else "json",
+            required=True,
+            description="format of stored columns (feather, parquet, json)"
+        )
+        self.register_option(
+            name="compression",
+            value=None,
+            required=False,
+            description="codec of stored columns (zstd, lz4, gzip, none)"
+        )
+        self.register_option(
+            name="compression-level",
+            value=None,
+            required=False,
+            description="compression level (none = codec default)"
+        )
+        self.register_option(
+            name="strings",
+            value="object",
+            required=True,
+            description="dtype of text columns (object, pyarrow)"
+        )
+        self.register_option(
+            name="mirror",
+            value=False,
+            required=True,
+            description="mirror the dataframe into the 'dataframe' table"
+        )
+        self.register_option(
+            name="mirror-index",
+            value=None,
+            required=False,
+            description="',' delimited columns to index in the mirror"
+        )
         self.register_option(
             name="user-agent",
             value=f"Computist/v{__version__.split('.')[0]}",
@@ -228,9 +275,15 @@ class Computist(framework.Framework):
         if not workspace:
             return
         path = os.path.join(self.spaces_path, workspace)
+        # complete saves to the previous workspace before leaving it
+        self.flush_dataframe()
+        # connections to the previous workspace are no longer needed
+        self._connections.close()
         self.cache_path = os.path.join(self.spaces_path, workspace, "cache")
         self.workspace = framework.Framework.workspace = path
-        self.dataframe = framework.Framework.dataframe = None
+        # the dataframe is read from the storage when it is first used
+        self.unload_dataframe()
+        framework.Framework._dataframe = self._dataframe
         if not os.path.exists(path):
             os.makedirs(path)
             os.makedirs(self.cache_path)
@@ -246,8 +299,14 @@ class Computist(framework.Framework):
         self._load_config()
         # reload modules after config to populate options
         self._load_modules()
-        # load workspace data
-        self.load_dataframe()
+        # only describe the workspace data
+        store = self._get_storage()
+        if store.exists():
+            manifest = store.manifest()
+            self.verbose(
+                f"Dataframe: {manifest['rows']} rows, "
+                f"{len(manifest['columns'])} columns."
+            )
         return True
 
     def remove_workspace(self, workspace):
@@ -263,6 +322,8 @@ class Computist(framework.Framework):
             else:
                 raise
         path = os.path.join(self.spaces_path, workspace)
+        self._writer.wait()
+        self._connections.close(os.path.join(path, "data.db"))
         try:
             shutil.rmtree(path, onerror=errorRemoveReadonly)
         except OSError:
@@ -283,6 +344,51 @@ class Computist(framework.Framework):
         snapshots = self.query("SELECT SNAPSHOT FROM snapshots")
         return [snapshot[0] for snapshot in snapshots]
 
+    def _get_snapshot_file(self, snapshot):
+        # snapshots are copies of the data folder, or a single file for
+        # snapshots taken by earlier versions
+        path = os.path.join(self.workspace, snapshot)
+        if os.path.isdir(path):
+            return path
+        for filename in storage.LEGACY_FILES:
+            ext = os.path.splitext(filename)[1]
+            if os.path.exists(path + ext):
+                return path + ext
+        return None
+
+    def _get_snapshot_reader(self, snapshot):
+        """Returns the manifest of a snapshot, or of the stored data for
+        'current', and a function that locates the files of its entries"""
+        if snapshot == "current":
+            self.flush_dataframe()
+            store = self._get_storage()
+            if store.exists():
+                return store.manifest(), \
+                    lambda x: os.path.join(store.path, x["file"])
+            return None, None
+        if snapshot not in self._get_snapshots():
+            return None, None
+        if self._revisioning:
+            cr = self.query(
+                "SELECT revision FROM snapshots WHERE snapshot IS ?",
+                (snapshot,)
+            )[0][0]
+            r = svn.local.LocalClient(self.workspace)
+            try:
+                manifest = json.loads(
+                    r.cat("data/manifest.json", revision=cr)
+                )
+            except Exception:
+                # revisions committed before the column storage was used
+                return None, None
+            return manifest, lambda x: io.BytesIO(
+                r.cat(f"data/{x['file']}", revision=cr)
+            )
+        snapshots = storage.SnapshotStore(self.workspace)
+        if snapshots.exists(snapshot):
+            return snapshots.manifest(snapshot), snapshots.locate
+        return None, None
+
     def _db_version(self):
         return self.query("PRAGMA user_version")[0][0]
 
@@ -295,7 +401,11 @@ class Computist(framework.Framework):
             ("CREATE TABLE IF NOT EXISTS snapshots (snapshot TEXT PRIMARY KEY,"
              + " date TEXT, revision TEXT, notes TEXT, module TEXT)")
         )
-        self.query("PRAGMA user_version = 1")  # always latest DB version
+        self.query(
+            ("CREATE TABLE IF NOT EXISTS counts (name TEXT PRIMARY KEY, "
+             + "rows INT)")
+        )
+        self.query("PRAGMA user_version = 2")  # always latest DB version
 
     def _migrate_db(self):
         db_orig = self._db_version()
@@ -312,9 +422,16 @@ class Computist(framework.Framework):
             )
             self.query(f"DROP TABLE {tmp}")
             self.query("PRAGMA user_version = 1")
+        if self._db_version() == 1:
+            # row counts of the result tables, kept up to date by triggers
+            self.query(
+                "CREATE TABLE counts (name TEXT PRIMARY KEY, rows INT)"
+            )
+            self._count_tables()
+            self.query("PRAGMA user_version = 2")
         if db_orig != self._db_version():
             self.alert(
-                f"Database upgraded to version {self._db_version(self)}."
+                f"Database upgraded to version {self._db_version()}."
             )
 
     def _create_repository(self):
@@ -475,22 +592,30 @@ class Computist(framework.Framework):
 
     def _do_snapshots_take(self, params):
         """Takes a snapshot of the current environment"""
+        self.flush_dataframe()
         ts = datetime.strftime(datetime.now(), "%Y%m%d%H%M%S")
         if self._revisioning:
             r = svn.local.LocalClient(self.workspace)
+            # column files are replaced when saving, so schedule added and
+            # removed files before committing
+            r.run_command("add", ["--force", "data"], wd=self.workspace)
+            for entry in r.status():
+                if entry.type_raw_name == "missing":
+                    r.run_command("delete", [entry.name], wd=self.workspace)
             r.commit(f"snapshot_{ts}")
             r.update()
             cr = r.info()["commit_revision"]
         else:
-            # Simply copying data without a SVN repository leads to data
-            # duplication and is less efficient for disk storage. Keep simple
-            # copying for users without SVN installed. Hopefully they use it
-            # for smaller datasets.
+            # Without a SVN repository the snapshot store keeps every column
+            # file once under the hash of its content, so unchanged columns
+            # are never duplicated.
             cr = 0
-            src = os.path.join(self.workspace, "data.json")
-            dst = os.path.join(self.workspace, f"snapshot_{ts}.json")
-            if os.path.exists(src):
-                shutil.copyfile(src, dst)
+            store = self._get_storage()
+            if store.exists():
+                count = storage.SnapshotStore(self.workspace).take(
+                    store, f"snapshot_{ts}"
+                )
+                self.verbose(f"{count} new column file(s) stored.")
         self.insert_snapshot(snapshot=f"{ts}", notes=params, revision=cr,
                              mute=True)
         self.output(f"Snapshot created: snapshot_{ts}")
@@ -501,6 +626,8 @@ class Computist(framework.Framework):
             self._help_snapshots_load()
             return
         if params in self._get_snapshots():
+            # a pending save must not overwrite the loaded snapshot
+            self.flush_dataframe()
             cr = self.query(
                 ("SELECT revision FROM snapshots "
                  + f"WHERE snapshot LIKE '{params}'")
@@ -508,11 +635,29 @@ class Computist(framework.Framework):
             if self._revisioning:
                 r = svn.local.LocalClient(self.workspace)
                 r.update(revision=cr)
+            elif storage.SnapshotStore(self.workspace).exists(params):
+                count = storage.SnapshotStore(self.workspace).load(
+                    self._get_storage(), params
+                )
+                self.verbose(f"{count} column file(s) restored.")
             else:
-                src = os.path.join(self.workspace, params + ".json")
-                dst = os.path.join(self.workspace, "data.json")
-                shutil.copyfile(src, dst)
-            self.load_dataframe()
+                src = self._get_snapshot_file(params)
+                if not src:
+                    self.error(f"No data stored for snapshot '{params}'.")
+                    return
+                dst = self._get_storage().path
+                if os.path.isdir(dst):
+                    shutil.rmtree(dst)
+                if os.path.isdir(src):
+                    shutil.copytree(src, dst)
+                else:
+                    # migrated to the column storage when loaded
+                    shutil.copyfile(src, os.path.join(
+                        self.workspace, "data" + os.path.splitext(src)[1]
+                    ))
+            self.unload_dataframe()
+            if self._global_options["mirror"]:
+                self._mirror_dataframe(self.dataframe)
             self.output(f"Snapshot loaded: {params}")
         else:
             self.error(f"No snapshot named '{params}'.")
@@ -526,8 +671,13 @@ class Computist(framework.Framework):
             if self._revisioning:
                 self.alert("Cannot remove snapshot from repository.")
             else:
-                path = os.path.join(self.workspace, params + ".json")
-                if os.path.exists(path):
+                snapshots = storage.SnapshotStore(self.workspace)
+                path = self._get_snapshot_file(params)
+                if snapshots.exists(params):
+                    snapshots.remove(params)
+                elif path and os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif path:
                     os.remove(path)
                 self.query(
                     "DELETE FROM snapshots WHERE SNAPSHOT IS ?", (params,)
@@ -536,6 +686,87 @@ class Computist(framework.Framework):
         else:
             self.error(f"No snapshot named '{params}'.")
 
+    def _do_snapshots_peek(self, params):
+        """Shows the contents of a snapshot without loading it"""
+        snapshot, columns = self._parse_params(params)
+        if not snapshot:
+            self._help_snapshots_peek()
+            return
+        manifest, locate = self._get_snapshot_reader(snapshot)
+        if manifest is None:
+            self.error(f"No data stored for snapshot '{snapshot}'.")
+            return
+        self.output(f"Rows: {manifest['rows']}")
+        self.table(
+            [[x["name"], x["dtype"], x["format"]]
+             for x in manifest["columns"]],
+            header=["Columns", "Dtype", "Format"]
+        )
+        if columns:
+            columns = "".join(columns.split()).split(",")
+            dataframe = storage.read_manifest(manifest, columns, locate)
+            self.output(f"{os.linesep}{str(dataframe)}")
+
+    def _do_snapshots_diff(self, params):
+        """Compares snapshots without loading them"""
+        a, b = self._parse_params(params)
+        if not a:
+            self._help_snapshots_diff()
+            return
+        b = b or "current"
+        a_manifest, a_locate = self._get_snapshot_reader(a)
+        b_manifest, b_locate = self._get_snapshot_reader(b)
+        for name, manifest in [(a, a_manifest), (b, b_manifest)]:
+            if manifest is None:
+                self.error(f"No data stored for snapshot '{name}'.")
+                return
+        self.output(f"Rows: {a_manifest['rows']} => {b_manifest['rows']}")
+        a_index, b_index = a_manifest["index"], b_manifest["index"]
+        if a_index.get("hash", a_index) != b_index.get("hash", b_index):
+            self.output("Index changed.")
+        changes = storage.compare(a_manifest, b_manifest)
+        if not changes:
+            self.output("No columns changed.")
+            return
+        tdata = []
+        samples = []
+        for column, change in changes:
+            if change not in ["modified", "dtype"]:
+                tdata.append([column, change, ""])
+                continue
+            # only the changed columns are read
+            a_data = storage.read_manifest(
+                a_manifest, [column], a_locate
+            )[column]
+            b_data = storage.read_manifest(
+                b_manifest, [column], b_locate
+            )[column]
+            a_data, b_data = a_data.align(b_data, join="inner")
+            a_data = a_data.astype(object)
+            b_data = b_data.astype(object)
+            changed = ~((a_data == b_data)
+                        | (a_data.isna() & b_data.isna())).values
+            tdata.append([column, change, int(changed.sum())])
+            for i in changed.nonzero()[0][:5]:
+                samples.append([
+                    a_data.index[i], column,
+                    self.to_unicode_str(a_data.iat[i])[:40],
+                    self.to_unicode_str(b_data.iat[i])[:40]
+                ])
+        self.table(tdata, header=["Columns", "Change", "Cells"])
+        if samples:
+            self.table(samples, header=["Row", "Column", a, b])
+
+    def _do_snapshots_gc(self, params):
+        """Removes stored data no longer used by any snapshot"""
+        if self._revisioning:
+            self.alert("Snapshots are stored in the repository.")
+            return
+        count, size = storage.SnapshotStore(self.workspace).collect()
+        self.output(
+            f"Removed {count} unused column file(s) ({size / 2**20:.1f} MB)."
+        )
+
     def _do_modules_load(self, params):
         """Loads a module"""
         # validate global options before loading the module
@@ -571,18 +802,20 @@ class Computist(framework.Framework):
             y.prompt = self._prompt_template.format(
                 self.prompt[:-3], mod_dispname.split(os.path.sep)[-1]
             )
-            # store pointer to dataset
-            y.dataframe = self.dataframe
+            # store pointer to dataset, which may not be loaded yet
+            y._dataframe = self._dataframe
             try:
                 y.cmdloop()
             except KeyboardInterrupt:
                 print("")
             # store new pointer to dataset
-            self.dataframe = y.dataframe
+            self._dataframe = y._dataframe
             if y._exit == 1:
                 return True
             if y._reload == 1:
                 self.output("Reloading module...")
+                # workers keep the previously imported code
+                self._workers.close()
                 # reload the module in memory
                 is_loaded = self._load_module(
                     os.path.dirname(mod_loadpath),
@@ -596,6 +829,7 @@ class Computist(framework.Framework):
     def _do_modules_reload(self, params):
         """Reloads installed modules"""
         self.output("Reloading modules...")
+        self._workers.close()
         self._load_modules()
 
     # ##=======================================================================
@@ -632,6 +866,21 @@ class Computist(framework.Framework):
         print(getattr(self, "_do_snapshots_load").__doc__)
         print(f"{os.linesep}Usage: snapshots load <name>{os.linesep}")
 
+    def _help_snapshots_peek(self):
+        print(getattr(self, "_do_snapshots_peek").__doc__)
+        print(
+            (f"{os.linesep}Usage: snapshots peek <name> "
+             + f"[<column(s)>]{os.linesep}")
+        )
+        print(f"columns(s) => ',' delimited values{os.linesep}")
+
+    def _help_snapshots_diff(self):
+        print(getattr(self, "_do_snapshots_diff").__doc__)
+        print(
+            (f"{os.linesep}Usage: snapshots diff <name> "
+             + f"[<name>|current]{os.linesep}")
+        )
+
     def _help_snapshots_remove(self):
         print(getattr(self, "_do_snapshots_remove").__doc__)
         print(f"{os.linesep}Usage: snapshots remove <name>{os.linesep}")
@@ -664,11 +913,17 @@ class Computist(framework.Framework):
 
     def _complete_snapshots_list(self, text, *ignored):
         return []
-    _complete_snapshots_take = _complete_snapshots_list
+    _complete_snapshots_take = _complete_snapshots_gc = \
+        _complete_snapshots_list
 
     def _complete_snapshots_load(self, text, *ignored):
         return [x for x in self._get_snapshots() if x.startswith(text)]
-    _complete_snapshots_remove = _complete_snapshots_load
+    _complete_snapshots_remove = _complete_snapshots_peek = \
+        _complete_snapshots_load
+
+    def _complete_snapshots_diff(self, text, *ignored):
+        return [x for x in self._get_snapshots() + ["current"]
+                if x.startswith(text)]
 
     def _complete_modules_reload(self, text, *ignored):
         return []
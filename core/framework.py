@@ -3,6 +3,17 @@ Copyright (c) 2012-2021 Tim Tomes
 Modifications Copyright (c) 2021 Jan William Johnsen
 2021-02-23: Updated the framework to manage a Pandas dataframe and other
 small fixes.
+2026-10-18: 1) The dataframe is stored in a columnar workspace storage (see
+core/storage.py) instead of data.json. 2) Only the columns modified since the
+last load or save are written.
+2026-10-18: 1) Database queries reuse pooled SQLite connections in WAL mode.
+2) Added insert_many for inserting many rows in a single transaction. 3) The
+dataframe is saved on a background writer thread. 4) Column files can be
+compressed. 5) Added write_dataframe to store a dataframe in batches. 6) Text
+columns can be kept as arrow strings. 7) The dataframe can be mirrored into
+the database. 8) The dashboard reads row counts kept up to date by triggers.
+9) The dataframe is read from the storage when it is first used. 10) Worker
+processes are kept in a pool that lives for the session.
 
 This program is free software: you can redistribute it and/or modify
 it under the terms of the GNU General Public License as published by
@@ -22,8 +33,8 @@ from contextlib import closing
 from datetime import datetime
 import cmd
 import codecs
-import inspect
 import json
+import multiprocessing as mp
 import os
 import re
 import requests
@@ -31,13 +42,17 @@ import sqlite3
 import platform
 import subprocess
 import sys
+import threading
 import traceback
 import pandas as pd
 import random
+import signal
 import string
 import importlib
 if importlib.util.find_spec('svn'):
     import svn.local
+# framework libs
+from core import storage
 
 
 # #============================================================================
@@ -45,11 +60,142 @@ if importlib.util.find_spec('svn'):
 # #============================================================================
 
 
+# marks a dataframe that has not been read from the storage yet
+_UNLOADED = object()
+
+
 class FrameworkException(Exception):
     def __init__(self, message):
         Exception.__init__(self, message)
 
 
+class ConnectionPool(object):
+    """Keeps one open SQLite connection per process, thread and database so
+    queries skip the connection setup and reuse cached statements."""
+
+    def __init__(self, timeout=30, cached_statements=256):
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        key = (os.getpid(), threading.get_ident(), path)
+        with self._lock:
+            conn = self._connections.get(key)
+        if conn is None:
+            # thread idents are reused, and the connections of threads that
+            # have exited are not used again
+            alive = {x.ident for x in threading.enumerate()}
+            self._close(lambda x: x[1] not in alive)
+            conn = sqlite3.connect(
+                path, timeout=self.timeout, check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+            # with write-ahead logging readers don't block the writer, and
+            # commits don't need to sync the database file
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                self._connections[key] = conn
+        return conn
+
+    def close(self, path=None):
+        """Closes the connections to a database, or to all databases."""
+        self._close(lambda x: path is None or x[2] == path)
+
+    def release(self):
+        """Closes the connections of the calling thread, which threads
+        call before they exit."""
+        ident = threading.get_ident()
+        self._close(lambda x: x[0] == os.getpid() and x[1] == ident)
+
+    def _close(self, select):
+        with self._lock:
+            for key in list(self._connections):
+                if select(key):
+                    conn = self._connections.pop(key)
+                    # connections inherited from a parent process belong
+                    # to the parent
+                    if key[0] == os.getpid():
+                        conn.close()
+
+
+class WorkerPool(object):
+    """Keeps the worker processes alive between module runs so the workers
+    only start, and import their libraries, once per session. The pool is
+    replaced when the number of processes or the start method changes."""
+
+    # libraries the forkserver imports once for all workers it starts
+    preload = ["numpy", "pandas", "pyarrow", "nltk"]
+
+    def __init__(self):
+        self._pool = None
+        self._key = None
+        self._lock = threading.Lock()
+
+    def get(self, processes, method=None):
+        key = (os.getpid(), processes, method)
+        with self._lock:
+            if self._pool is not None and self._key == key:
+                return self._pool
+            if method not in (None, *mp.get_all_start_methods()):
+                raise FrameworkException(
+                    f"Invalid start method '{method}'. Choose from: "
+                    f"{', '.join(mp.get_all_start_methods())}."
+                )
+            self._shutdown()
+            context = mp.get_context(method)
+            if method == "forkserver":
+                context.set_forkserver_preload(
+                    [x for x in self.preload if importlib.util.find_spec(x)]
+                )
+            self._pool = context.Pool(processes=processes,
+                                      initializer=self._initialize)
+            self._key = key
+            return self._pool
+
+    def ready(self, processes, method=None):
+        """Returns whether get returns workers that are already running"""
+        return self._pool is not None and \
+            self._key == (os.getpid(), processes, method)
+
+    @staticmethod
+    def forks(method=None):
+        """Returns whether the workers are forked from the calling process,
+        so they inherit the locks its other threads hold"""
+        return method in (None, *mp.get_all_start_methods()) and \
+            mp.get_context(method).get_start_method() == "fork"
+
+    def close(self):
+        """Waits for the workers to finish their tasks and stops them"""
+        with self._lock:
+            self._shutdown()
+
+    def terminate(self):
+        """Stops the workers without waiting for their tasks"""
+        with self._lock:
+            self._shutdown(terminate=True)
+
+    def _shutdown(self, terminate=False):
+        if self._pool is None:
+            return
+        # a pool inherited from a parent process belongs to the parent
+        if self._key[0] == os.getpid():
+            if terminate:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+        self._pool = None
+        self._key = None
+
+    @staticmethod
+    def _initialize():
+        # the parent handles interrupts and terminates the workers
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
 class Colors(object):
     if platform.system() == "Windows":
         N = R = G = O = B = ""
@@ -157,7 +303,10 @@ class Framework(cmd.Cmd):
     _record = None
     _spool = None
     _summary_counts = {}
-    dataframe = None
+    _dataframe = None
+    _connections = ConnectionPool()
+    _writer = storage.Writer()
+    _workers = WorkerPool()
 
     def __init__(self, params):
         cmd.Cmd.__init__(self)
@@ -171,6 +320,7 @@ class Framework(cmd.Cmd):
         self._revisioning = True if sys.modules.get('svn.local') else False
         self.pbar = None
         self._exit = 0
+        self._user_defined = False
 
     # ##=======================================================================
     # CMD OVERRIDE METHODS
@@ -199,6 +349,11 @@ class Framework(cmd.Cmd):
             Framework._spool.flush()
         return line
 
+    def postcmd(self, stop, line):
+        # saves finish on the background writer while commands run
+        self._report_saves()
+        return stop
+
     def onecmd(self, line):
         cmd, arg, line = self.parseline(line)
         if not line:
@@ -424,7 +579,8 @@ class Framework(cmd.Cmd):
         """Queries the database and returns the results as a list."""
         self.debug(f"DATABASE => {path}")
         self.debug(f"QUERY => {query}")
-        with sqlite3.connect(path) as conn:
+        conn = self._connections.get(path)
+        with conn:
             with closing(conn.cursor()) as cur:
                 if values:
                     self.debug(f"VALUES => {repr(values)}")
@@ -444,6 +600,21 @@ class Framework(cmd.Cmd):
                     results = cur.rowcount
                 return results
 
+    def query_many(self, *args, **kwargs):
+        path = os.path.join(self.workspace, "data.db")
+        return self._query_many(path, *args, **kwargs)
+
+    def _query_many(self, path, query, values):
+        """Executes the query once for every set of values in a single
+        transaction and returns the affected row count."""
+        self.debug(f"DATABASE => {path}")
+        self.debug(f"QUERY => {query}")
+        conn = self._connections.get(path)
+        with conn:
+            with closing(conn.cursor()) as cur:
+                cur.executemany(query, values)
+                return cur.rowcount
+
     def get_columns(self, table):
         return [(x[1], x[2]) for x in self.query(
             f"PRAGMA table_info('{table}')")]
@@ -451,7 +622,37 @@ class Framework(cmd.Cmd):
     def get_tables(self):
         return [x[0] for x in self.query(
             "SELECT name FROM sqlite_master WHERE type='table'"
-        ) if x[0] not in ["dashboard", "snapshots"]]
+        ) if x[0] not in ["dashboard", "snapshots", "dataframe", "counts"]]
+
+    def _count_tables(self):
+        """Returns the row counts of the result tables. Triggers keep them
+        up to date in the counts table, so tables are only counted once,
+        when their triggers are created."""
+        tables = self.get_tables()
+        triggers = [x[0] for x in self.query(
+            "SELECT name FROM sqlite_master WHERE type='trigger'"
+        )]
+        for table in tables:
+            if f"counts_insert_{table}" in triggers:
+                continue
+            name = table.replace("'", "''")
+            for event, change in [("insert", "+"), ("delete", "-")]:
+                self.query(
+                    (f"CREATE TRIGGER `counts_{event}_{table}` AFTER "
+                     + f"{event.upper()} ON `{table}` BEGIN UPDATE counts "
+                     + f"SET rows = rows {change} 1 WHERE name = '{name}'; "
+                     + "END")
+                )
+            self.query(
+                ("INSERT OR REPLACE INTO counts (name, rows) "
+                 + f"SELECT ?, COUNT(*) FROM `{table}`"),
+                (table,)
+            )
+        counts = dict(self.query("SELECT name, rows FROM counts"))
+        # forget dropped tables
+        for table in set(counts) - set(tables):
+            self.query("DELETE FROM counts WHERE name IS ?", (table,))
+        return {table: counts.get(table, 0) for table in tables}
 
     # ##=======================================================================
     # INSERT METHODS
@@ -472,11 +673,7 @@ class Framework(cmd.Cmd):
         unique_columns : a list of column names that should be used to
                          determine if the information being inserted is
                          unique"""
-        # set module to the calling module unless the do_add command was used
-        if "_do_db_insert" in [x[3] for x in inspect.stack()]:
-            data["module"] = "user_defined"
-        else:
-            data["module"] = self._modulename.split(os.path.sep)[-1]
+        data["module"] = self._get_inserting_module()
         # sanitize the inputs to remove NoneTypes, blank strings, and zeros
         columns = [x for x in data.keys() if data[x]]
         # make sure that module is not seen as a unique column
@@ -508,14 +705,141 @@ class Framework(cmd.Cmd):
 
         # query the database
         rowcount = self.query(query, values)
+        self._count_inserts(table, 1, rowcount)
+        return rowcount
+
+    def insert_many(self, table, rows, unique_columns=[]):
+        """Inserts many items into database in a single transaction and
+        returns the affected row count.
+        table          : the table to insert the data into
+        rows           : the information to insert into the database table in
+                         the form of a list of dictionaries like the data of
+                         insert, or a dataframe where the column labels are
+                         the column names
+        unique_columns : a list of column names that should be used to
+                         determine if the information being inserted is
+                         unique"""
+        if isinstance(rows, pd.DataFrame):
+            columns = [str(x) for x in rows.columns]
+            records = rows.itertuples(index=False, name=None)
+        else:
+            rows = list(rows)
+            columns = list(dict.fromkeys(x for row in rows for x in row))
+            records = [tuple(row.get(x) for x in columns) for row in rows]
+        # module is set for every row below
+        positions = [i for i, x in enumerate(columns) if x != "module"]
+        columns = [columns[i] for i in positions]
+        unique_columns = [x for x in unique_columns
+                          if x in columns and x != "module"]
+        if not columns:
+            return 0
+        module = self._get_inserting_module()
+        values = [tuple(self._to_column_value(record[i]) for i in positions)
+                  + (module,) for record in records]
 
+        # build the insert query
+        columns_str = "`, `".join(columns + ["module"])
+        placeholder_str = ", ".join("?"*(len(columns)+1))
+        if not unique_columns:
+            query = (f"INSERT INTO `{table}` (`{columns_str}`) "
+                     + f"VALUES ({placeholder_str})")
+        else:
+            return self._insert_staged(table, columns + ["module"],
+                                       unique_columns, values)
+        # query the database
+        rowcount = self.query_many(query, values) if values else 0
+        self._count_inserts(table, len(values), rowcount)
+        return rowcount
+
+    def _insert_staged(self, table, columns, unique_columns, values):
+        """Inserts the rows that are unique, like insert does for every row:
+        a row is skipped if a stored or an earlier row has the same values
+        in the unique columns that are not empty in the row. The rows are
+        staged in a temporary table and compared in a single query for all
+        rows with the same empty unique columns."""
+        path = os.path.join(self.workspace, "data.db")
+        columns_str = "`, `".join(columns)
+        unique = [columns.index(x) for x in unique_columns]
+        # the unique columns that are not empty, for every kind of row
+        patterns = {tuple(row[i] is not None for i in unique)
+                    for row in values}
+        self.debug(f"DATABASE => {path}")
+        conn = self._connections.get(path)
+        with conn:
+            with closing(conn.cursor()) as cur:
+                # unlike a unique index, it doesn't constrain later inserts
+                cur.execute(
+                    ("CREATE INDEX IF NOT EXISTS "
+                     + f"`{'_'.join(['index', table] + unique_columns)}` "
+                     + f"ON `{table}` (`{'`, `'.join(unique_columns)}`)")
+                )
+                cur.execute("DROP TABLE IF EXISTS temp.`staging`")
+                cur.execute(
+                    (f"CREATE TEMP TABLE `staging` (`{columns_str}`, "
+                     + "`staging_duplicate`)")
+                )
+                cur.executemany(
+                    (f"INSERT INTO temp.`staging` (`{columns_str}`) VALUES "
+                     + f"({', '.join('?' * len(columns))})"), values
+                )
+                for pattern in patterns:
+                    present = [x for x, y in zip(unique_columns, pattern)
+                               if y]
+                    # rows without unique values are always inserted
+                    if not present:
+                        continue
+                    kind = " and ".join(
+                        f"s.`{x}` IS {'NOT ' if y else ''}NULL"
+                        for x, y in zip(unique_columns, pattern)
+                    )
+                    cur.execute(
+                        ("CREATE INDEX temp.`staging_index` ON `staging` "
+                         + f"(`{'`, `'.join(present)}`)")
+                    )
+                    query = (
+                        "UPDATE temp.`staging` AS s "
+                        + f"SET `staging_duplicate`=1 WHERE {kind} "
+                        + f"AND (EXISTS(SELECT * FROM `{table}` AS t WHERE "
+                        + f"{self._matches('t', present)}) OR EXISTS(SELECT "
+                        + "* FROM temp.`staging` AS e WHERE e.rowid<s.rowid "
+                        + f"AND {self._matches('e', present)}))"
+                    )
+                    self.debug(f"QUERY => {query}")
+                    cur.execute(query)
+                    cur.execute("DROP INDEX temp.`staging_index`")
+                cur.execute(
+                    (f"INSERT INTO `{table}` (`{columns_str}`) "
+                     + f"SELECT `{columns_str}` FROM temp.`staging` "
+                     + "WHERE `staging_duplicate` IS NULL ORDER BY rowid")
+                )
+                rowcount = cur.rowcount
+                cur.execute("DROP TABLE temp.`staging`")
+        self._count_inserts(table, len(values), rowcount)
+        return rowcount
+
+    @staticmethod
+    def _matches(alias, columns):
+        return " and ".join(f"{alias}.`{x}`=s.`{x}`" for x in columns)
+
+    def _count_inserts(self, table, count, rowcount):
         # increment summary tracker
         if table not in self._summary_counts:
             self._summary_counts[table] = {"count": 0, "new": 0}
         self._summary_counts[table]["new"] += rowcount
-        self._summary_counts[table]["count"] += 1
+        self._summary_counts[table]["count"] += count
 
-        return rowcount
+    def _get_inserting_module(self):
+        # set module to the calling module unless the do_add command was used
+        if self._user_defined:
+            return "user_defined"
+        return self._modulename.split(os.path.sep)[-1]
+
+    def _to_column_value(self, value):
+        # store NoneTypes, blank strings, zeros and NaNs as NULL
+        if not value or (isinstance(value, float) and value != value):
+            return None
+        # convert any type to unicode (str) for external processing
+        return self.to_unicode_str(value)
 
     def insert_snapshot(self, snapshot=None, notes=None, revision=None,
                         mute=False):
@@ -537,29 +861,319 @@ class Framework(cmd.Cmd):
     # DATAFRAME METHODS
     # ##=======================================================================
 
-    def save_dataframe(self):
-        ts = datetime.strftime(datetime.now(), "%Y%m%d%H%M%S")
-        path = os.path.join(self.workspace, "data.json")
-        first = not os.path.exists(path)
-        self.dataframe.to_json(path)
+    def _get_storage(self):
+        """Returns the workspace storage, which writes columns in the format
+        selected by the global options, and migrates data written by earlier
+        versions"""
+        name = self._global_options["storage"]
+        if name not in storage.FORMATS:
+            raise FrameworkException(
+                (f"Invalid storage '{name}'. Use one of: "
+                 + f"{', '.join(storage.FORMATS)}.")
+            )
+        if not storage.FORMATS[name].available():
+            raise FrameworkException(
+                (f"Storage '{name}' requires "
+                 + f"'{storage.FORMATS[name].requires}'.")
+            )
+        compression = self._global_options["compression"]
+        if compression is not None and \
+                compression not in storage.FORMATS[name].codecs:
+            raise FrameworkException(
+                (f"Storage '{name}' does not support compression "
+                 + f"'{compression}'. Use one of: "
+                 + f"{', '.join(storage.FORMATS[name].codecs + ('none',))}.")
+            )
+        if not storage.FORMATS[name].codec_available(compression):
+            raise FrameworkException(
+                (f"Compression '{compression}' of storage '{name}' requires "
+                 + f"'{storage.FORMATS[name].codec_requires[compression]}'.")
+            )
+        strings = self._global_options["strings"]
+        if strings not in storage.STRINGS:
+            raise FrameworkException(
+                (f"Invalid strings '{strings}'. Use one of: "
+                 + f"{', '.join(storage.STRINGS)}.")
+            )
+        if strings == "pyarrow" and not importlib.util.find_spec("pyarrow"):
+            raise FrameworkException("Strings 'pyarrow' requires 'pyarrow'.")
+        store = storage.Storage(
+            self.workspace, name, compression,
+            self._global_options["compression-level"], strings
+        )
+        if not store.exists():
+            for filename in storage.LEGACY_FILES:
+                path = os.path.join(self.workspace, filename)
+                if os.path.exists(path):
+                    self._migrate_storage(path, store)
+                    break
+        return store
+
+    def _migrate_storage(self, path, store):
+        """Moves workspace data from a single file to the column storage"""
+        self.output(
+            (f"Migrating '{os.path.basename(path)}' to "
+             + f"'{store.format.name}' column storage...")
+        )
+        store.write(storage.read_legacy(path))
+        if self._revisioning:
+            r = svn.local.LocalClient(self.workspace)
+            r.run_command("add", ["--force", os.path.basename(store.path)],
+                          wd=self.workspace)
+            r.run_command("delete", ["--force", os.path.basename(path)],
+                          wd=self.workspace)
+        else:
+            os.remove(path)
+
+    def save_dataframe(self, wait=False):
+        """Saves the dataframe on the background writer, and only waits for
+        it to be written if wait is set or it is the first save"""
+        if self.peek_dataframe() is None:
+            # an unloaded dataframe has nothing new to write
+            return
+        store = self._get_storage()
+        if self._writer.error is not None:
+            self.alert(f"Retrying failed save: {self._writer.error}")
+        first = not store.exists() and not self._writer.saving
+        callback = None
+        if self._global_options["mirror"]:
+            callback = self._mirror_dataframe
+        self._writer.submit(store, self.dataframe, callback)
+        # keep track of changes to only write modified columns next time
+        if not isinstance(self.dataframe, storage.TrackedDataFrame):
+            self.dataframe = storage.TrackedDataFrame(self.dataframe)
+        if wait or first:
+            self.flush_dataframe()
+        if first:
+            self._commit_initial(store)
+
+    def write_dataframe(self, batches):
+        """Replaces the stored dataframe with batches of rows that are
+        written straight to the storage, so the data never has to fit in
+        memory at once. The dataframe is read from the storage when it is
+        used next. Returns the number of rows."""
+        # release the previous dataframe before writing the new one, and
+        # read the stored one again if the write fails
+        self.unload_dataframe()
+        self.flush_dataframe()
+        store = self._get_storage()
+        first = not store.exists()
+
+        def append(appender):
+            for batch in batches:
+                appender.append(batch)
+                yield batch
+
+        try:
+            with store.appender() as appender:
+                written = append(appender)
+                if self._global_options["mirror"]:
+                    # the mirror is built from the batches as they are
+                    # written
+                    self._rebuild_mirror(written)
+                else:
+                    for batch in written:
+                        pass
+        except NotImplementedError:
+            raise FrameworkException(
+                f"Storage '{store.format.name}' cannot be written in batches."
+            )
+        except ValueError as e:
+            raise FrameworkException(str(e))
+        if first:
+            self._commit_initial(store)
+        return appender.rows
+
+    def _mirror_dataframe(self, dataframe, written=None):
+        """Mirrors the dataframe into the 'dataframe' table of the database,
+        so it can be queried with SQL. The rowid of a row is its position
+        plus one. Only the written columns are updated while the rows stay
+        the same, otherwise the table is rebuilt."""
+        columns = [str(x) for x in dataframe.columns]
+        mirrored = [x[0] for x in self.get_columns("dataframe")]
+        rebuild = written is None or not mirrored or \
+            set(written) == set(columns) or not set(mirrored) <= set(columns)
+        if not rebuild:
+            rows = self.query("SELECT COUNT(*) FROM dataframe")[0][0]
+            rebuild = rows != len(dataframe)
+        if rebuild:
+            self._rebuild_mirror([dataframe])
+            return
+        conn = self._connections.get(os.path.join(self.workspace, "data.db"))
+        with conn:
+            with closing(conn.cursor()) as cur:
+                # all columns are updated, or none
+                cur.execute("BEGIN")
+                for column in written:
+                    i = columns.index(column)
+                    if column not in mirrored:
+                        cur.execute(
+                            (f"ALTER TABLE dataframe ADD COLUMN `{column}` "
+                             + self._sql_type(dataframe.iloc[:, i]))
+                        )
+                    cur.executemany(
+                        f"UPDATE dataframe SET `{column}`=? WHERE rowid=?",
+                        ((x[1], x[0])
+                         for x in self._mirror_rows(dataframe, [i]))
+                    )
+
+    def _rebuild_mirror(self, frames):
+        """Replaces the 'dataframe' table with the rows of the frames, one
+        frame after the other. The table is replaced in a single
+        transaction, so a failure keeps the previous table."""
+        conn = self._connections.get(os.path.join(self.workspace, "data.db"))
+        with conn:
+            with closing(conn.cursor()) as cur:
+                # DROP and CREATE would otherwise commit on their own
+                cur.execute("BEGIN")
+                cur.execute("DROP TABLE IF EXISTS dataframe")
+                created = False
+                rows = 0
+                for frame in frames:
+                    columns = [str(x) for x in frame.columns]
+                    if not columns:
+                        continue
+                    if not created:
+                        definition = ", ".join(
+                            f"`{x}` {self._sql_type(frame.iloc[:, i])}"
+                            for i, x in enumerate(columns)
+                        )
+                        cur.execute(f"CREATE TABLE dataframe ({definition})")
+                        created = True
+                    columns_str = "`, `".join(columns)
+                    placeholder_str = ", ".join("?"*(len(columns)+1))
+                    cur.executemany(
+                        (f"INSERT INTO dataframe (rowid, `{columns_str}`) "
+                         + f"VALUES ({placeholder_str})"),
+                        self._mirror_rows(frame, range(len(columns)), rows)
+                    )
+                    rows += len(frame)
+                if created and self._global_options["mirror-index"]:
+                    for column in str(
+                            self._global_options["mirror-index"]).split(","):
+                        column = column.strip()
+                        if column in columns:
+                            cur.execute(
+                                (f"CREATE INDEX `dataframe_{column}` ON "
+                                 + f"dataframe (`{column}`)")
+                            )
+
+    def _mirror_rows(self, dataframe, positions, offset=0, size=100000):
+        # rows are converted in batches, so the values of the whole
+        # dataframe never exist as Python objects at once
+        for start in range(0, len(dataframe), size):
+            part = dataframe.iloc[start:start+size]
+            values = [self._sql_values(part.iloc[:, i]) for i in positions]
+            first = offset + start + 1
+            yield from zip(range(first, first+len(part)), *values)
+
+    def _sql_type(self, series):
+        if pd.api.types.is_bool_dtype(series) or \
+                pd.api.types.is_integer_dtype(series):
+            return "INTEGER"
+        if pd.api.types.is_float_dtype(series):
+            return "REAL"
+        return "TEXT"
+
+    def _sql_values(self, series):
+        values = series.astype(object).where(series.notna(), None)
+        return [x if x is None or isinstance(x, (str, int, float))
+                else self.to_unicode_str(x) for x in values]
+
+    def _commit_initial(self, store):
         # initiate the local repository only once
-        if first and self._revisioning:
+        if self._revisioning:
+            ts = datetime.strftime(datetime.now(), "%Y%m%d%H%M%S")
             r = svn.local.LocalClient(self.workspace)
             message = "initial commit"
-            r.add("data.json")
+            r.add(os.path.basename(store.path))
             r.commit(message)
             r.update()
             cr = r.info()["commit_revision"]
             self.insert_snapshot(snapshot=f"{ts}", notes=message, revision=cr,
                                  mute=True)
 
-    def load_dataframe(self):
-        path = os.path.join(self.workspace, "data.json")
-        if os.path.isfile(path):
+    def flush_dataframe(self):
+        """Waits until the background writer has written all saves"""
+        if self._writer.saving or self._writer.pending:
+            self.verbose("Waiting for the dataframe to be saved...")
+        error = self._writer.wait()
+        self._report_saves()
+        if error is not None:
+            raise FrameworkException(f"Saving the dataframe failed: {error}")
+
+    def _report_saves(self):
+        """Reports the saves completed by the background writer"""
+        while self._writer.completed:
+            statistics = self._writer.completed.pop(0)
+            self.verbose(
+                (f"Saved {statistics['columns']} column(s): "
+                 + self._describe_save(statistics))
+            )
+
+    def _describe_save(self, statistics):
+        ratio = statistics["bytes"] / max(statistics["size"], 1)
+        throughput = statistics["bytes"] / max(statistics["seconds"], 1e-6)
+        return (f"{self._format_size(statistics['size'])} stored, "
+                + f"ratio {ratio:.1f}, {self._format_size(throughput)}/s")
+
+    def _format_size(self, size):
+        for unit in ["B", "KB", "MB", "GB"]:
+            if size < 1024:
+                break
+            size /= 1024
+        return f"{size:.1f} {unit}"
+
+    def load_dataframe(self, columns=None):
+        self.flush_dataframe()
+        store = self._get_storage()
+        if store.exists():
             print("Loading data. This can take a while...", end="\r")
-            self.dataframe = pd.read_json(path)
+            self.dataframe = store.read(columns)
             print(" " * 40)
 
+    @property
+    def dataframe(self):
+        """The workspace dataframe, read from the storage on first access"""
+        if self._dataframe is _UNLOADED:
+            self._dataframe = None
+            self.load_dataframe()
+        return self._dataframe
+
+    @dataframe.setter
+    def dataframe(self, dataframe):
+        self._dataframe = dataframe
+
+    def unload_dataframe(self):
+        """Drops the dataframe from memory until it is used again"""
+        self._dataframe = _UNLOADED
+
+    def peek_dataframe(self):
+        """Returns the dataframe if it is in memory, without loading it"""
+        if self._dataframe is _UNLOADED:
+            return None
+        return self._dataframe
+
+    def read_dataframe(self, columns=None):
+        """Returns the dataframe, or a projection of its columns, and only
+        reads from the storage when the dataframe is not in memory"""
+        dataframe = self.peek_dataframe()
+        if dataframe is not None:
+            return dataframe[columns] if columns else dataframe
+        self.flush_dataframe()
+        store = self._get_storage()
+        if store.exists():
+            return store.read(columns)
+        return None
+
+    def read_column(self, name):
+        """Returns a column of the dataframe, and only reads that column
+        from the storage when the dataframe is not in memory"""
+        dataframe = self.peek_dataframe()
+        if dataframe is None:
+            dataframe = self.read_dataframe([name])
+        return None if dataframe is None else dataframe[name]
+
     def revert_dataframe(self):
         """Revert dataframe back to first import"""
         r = svn.local.LocalClient(self.workspace)
@@ -791,6 +1405,11 @@ class Framework(cmd.Cmd):
     def do_exit(self, params):
         """Exits the framework"""
         self._exit = 1
+        error = self._writer.wait()
+        if error is not None:
+            self.error(f"Saving the dataframe failed: {error}")
+        self._workers.close()
+        self._connections.close()
         return True
 
     def do_back(self, params):
@@ -967,7 +1586,11 @@ class Framework(cmd.Cmd):
                             print(f"{value}")
             # add record to the database
             func = getattr(self, "insert_" + table)
-            count = func(mute=True, **record)
+            self._user_defined = True
+            try:
+                count = func(mute=True, **record)
+            finally:
+                self._user_defined = False
             self.output(f"{count} rows affected.")
         else:
             self.output("Invalid table name.")
@@ -1010,6 +1633,9 @@ class Framework(cmd.Cmd):
         if not params:
             self._help_db_query()
             return
+        if self._global_options["mirror"]:
+            # the mirror is updated by pending saves
+            self.flush_dataframe()
         try:
             results = self.query(params, include_header=True)
         except sqlite3.OperationalError as e:
@@ -1162,10 +1788,8 @@ class Framework(cmd.Cmd):
                 title="Activity Summary"
             )
             # display summary results table
-            tables = self.get_tables()
             tdata = []
-            for table in tables:
-                count = self.query(f"SELECT COUNT(*) FROM `{table}`")[0][0]
+            for table, count in self._count_tables().items():
                 tdata.append([table.title(), count])
             self.table(
                 tdata,
@@ -1188,30 +1812,75 @@ class Framework(cmd.Cmd):
 
     def _do_df_head(self, params):
         """Shows dataframe head"""
-        if self.dataframe is None:
+        columns = None
+        if params:
+            columns = "".join(params.split()).split(",")
+        dataframe = self.read_dataframe(columns)
+        if dataframe is None:
             self.output("This workspace has no dataframe.")
             return
-        if not params:
-            self.output(f"{os.linesep}{str(self.dataframe)}")
-            return
-        params = "".join(params.split()).split(",")
-        self.output(f"{os.linesep}{str(self.dataframe[params])}")
+        self.output(f"{os.linesep}{str(dataframe)}")
 
     def _do_df_columns(self, params):
         """Shows dataframe columns"""
-        if self.dataframe is None:
+        dataframe = self.peek_dataframe()
+        if dataframe is not None:
+            tdata = [[column, str(dtype)]
+                     for column, dtype in dataframe.dtypes.items()]
+        elif self._get_storage().exists():
+            # the manifest describes the columns without loading them
+            self.flush_dataframe()
+            tdata = [[x["name"], x["dtype"]]
+                     for x in self._get_storage().manifest()["columns"]]
+        else:
             self.output("This workspace has no dataframe.")
             return
-        tdata = [[column] for column in self.dataframe.columns.to_list()]
-        self.table(tdata, header=["Columns"])
+        self.table(tdata, header=["Columns", "Dtype"])
         return
 
     def _do_df_save(self, params):
         """Save dataframe"""
+        if self.peek_dataframe() is None:
+            if self._get_storage().exists():
+                self.output("The dataframe is unchanged since it was saved.")
+            else:
+                self.output("This workspace has no dataframe.")
+            return
+        self.save_dataframe(wait=params == "wait")
+        if params != "wait":
+            self.output("Saving in the background. See 'df status'.")
+
+    def _do_df_mirror(self, params):
+        """Mirrors the dataframe into the 'dataframe' table of the database"""
         if self.dataframe is None:
             self.output("This workspace has no dataframe.")
             return
-        self.save_dataframe()
+        self.flush_dataframe()
+        self._mirror_dataframe(self.dataframe)
+        self.output(
+            (f"Mirrored {len(self.dataframe)} rows. Query them with "
+             + "'db query SELECT ... FROM dataframe'.")
+        )
+
+    def _do_df_status(self, params):
+        """Shows the status of dataframe saves"""
+        writer = self._writer
+        status = "saving" if writer.saving else "idle"
+        if writer.pending:
+            status += " (save pending)"
+        saved = writer.saved.strftime(self.time_format) \
+            if writer.saved else "never"
+        tdata = [
+            ["Status", status],
+            ["Last saved", saved],
+            ["Columns written", len(writer.written)],
+            ["Saves coalesced", writer.coalesced],
+        ]
+        if writer.statistics:
+            tdata.append(["Written", self._describe_save(writer.statistics)])
+        if writer.error is not None:
+            tdata.append(["Error", str(writer.error)])
+        self.table(tdata, header=["Save", "Value"])
 
     # ##=======================================================================
     # HELP METHODS
@@ -1344,7 +2013,15 @@ class Framework(cmd.Cmd):
 
     def _help_df_save(self):
         print(getattr(self, "_do_df_save").__doc__)
-        print(f"{os.linesep}Usage: save{os.linesep}")
+        print(f"{os.linesep}Usage: save [wait]{os.linesep}")
+
+    def _help_df_mirror(self):
+        print(getattr(self, "_do_df_mirror").__doc__)
+        print(f"{os.linesep}Usage: mirror{os.linesep}")
+
+    def _help_df_status(self):
+        print(getattr(self, "_do_df_status").__doc__)
+        print(f"{os.linesep}Usage: status{os.linesep}")
 
     # ##=======================================================================
     # COMPLETE METHODS
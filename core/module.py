@@ -279,9 +279,9 @@ class BaseModule(framework.Framework):
         # data is added at runtime, so even if an error occurs, any new items
         # must be accounted for by a module execution attempt
         self.query(
-            ("INSERT OR REPLACE INTO dashboard (module, runs) VALUES "
-             + f"('{self._modulename}', COALESCE((SELECT runs FROM dashboard "
-             + f"WHERE module='{self._modulename}')+1, 1))")
+            ("INSERT INTO dashboard (module, runs) VALUES (?, 1) "
+             + "ON CONFLICT(module) DO UPDATE SET runs = runs + 1"),
+            (self._modulename,)
         )
         self.module_run(*params)
         self.module_post()
@@ -0,0 +1,920 @@
+"""
+Copyright (c) 2021 Jan William Johnsen
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from datetime import datetime
+from time import perf_counter
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+from importlib import util
+if util.find_spec('pyarrow'):
+    import pyarrow.feather
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+# single file layouts written by earlier versions, migrated on first use
+LEGACY_FILES = ("data.json", "data.parquet", "data.arrow")
+# compression codecs of the column files, not every format supports each
+CODECS = ("zstd", "lz4", "gzip")
+# dtypes of text columns, Python objects or strings kept in arrow memory
+STRINGS = ("object", "pyarrow")
+
+
+# #============================================================================
+# DATAFRAME CLASSES
+# #============================================================================
+
+
+class TrackedDataFrame(pd.DataFrame):
+    """Dataframe that records which columns have been changed since it was
+    loaded or saved, so the storage only has to write those columns."""
+    _metadata = ["_dirty", "_full"]
+
+    def __init__(self, *args, **kwargs):
+        super(TrackedDataFrame, self).__init__(*args, **kwargs)
+        self.mark_clean()
+
+    @property
+    def dirty(self):
+        """Returns the changed columns, or None if the dataframe was changed
+        in a way that requires it to be written in full."""
+        if self._full:
+            return None
+        return set(self._dirty)
+
+    def is_dirty(self, name):
+        """Returns whether the column has to be written by the next save"""
+        return self._full or name in self._dirty
+
+    def mark_clean(self):
+        self._dirty = set()
+        self._full = False
+
+    def mark_dirty(self, columns=None):
+        """Marks columns as changed. Modules that modify values in place
+        through the underlying arrays, or with inplace methods of a single
+        column, should call this themselves."""
+        if columns is None:
+            columns = self.columns
+        elif isinstance(columns, str) or not pd.api.types.is_list_like(
+                columns):
+            columns = [columns]
+        self._dirty.update(columns)
+
+    def _writable(self, columns):
+        # columns read from a memory-mapped file are read-only views of it,
+        # and are only copied when values are assigned into them
+        if columns is not None and (isinstance(columns, str) or
+                                    not pd.api.types.is_list_like(columns)):
+            columns = [columns]
+        for i, name in enumerate(self.columns):
+            if columns is not None and name not in columns:
+                continue
+            column = super(TrackedDataFrame, self).iloc[:, i]
+            values = column.to_numpy(copy=False)
+            if isinstance(values, np.ndarray) and not values.flags.writeable:
+                super(TrackedDataFrame, self).isetitem(i, column.copy())
+
+    def _track(self, func, columns):
+        result = func()
+        self.mark_dirty(columns)
+        return result
+
+    # operations with inplace=True and assignments to the index or columns
+    # are not tracked column by column
+    def _update_inplace(self, *args, **kwargs):
+        self._full = True
+        return super(TrackedDataFrame, self)._update_inplace(*args, **kwargs)
+
+    def _set_axis(self, *args, **kwargs):
+        self._full = True
+        return super(TrackedDataFrame, self)._set_axis(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        # boolean masks and frames select rows or cells in every column
+        columns = key
+        if isinstance(key, (pd.DataFrame, pd.Series, slice)) or \
+                pd.api.types.is_bool_dtype(getattr(key, "dtype", None)):
+            columns = None
+            self._writable(columns)
+        return self._track(
+            lambda: super(TrackedDataFrame, self).__setitem__(key, value),
+            columns
+        )
+
+    def __delitem__(self, key):
+        result = super(TrackedDataFrame, self).__delitem__(key)
+        self._dirty.discard(key)
+        return result
+
+    def insert(self, loc, column, value, *args, **kwargs):
+        return self._track(
+            lambda: super(TrackedDataFrame, self).insert(
+                loc, column, value, *args, **kwargs
+            ),
+            column
+        )
+
+    def isetitem(self, loc, value):
+        return self._track(
+            lambda: super(TrackedDataFrame, self).isetitem(loc, value),
+            self.columns[loc]
+        )
+
+    def replace(self, *args, **kwargs):
+        # some replacements modify the blocks without _update_inplace
+        if kwargs.get("inplace"):
+            self._full = True
+        return super(TrackedDataFrame, self).replace(*args, **kwargs)
+
+    def _indexed_columns(self, key, positional):
+        # only (rows, columns) keys are narrowed down to single columns
+        if not isinstance(key, tuple) or len(key) != 2:
+            return None
+        key = key[1]
+        try:
+            if positional:
+                labels = self.columns[key]
+                return labels if pd.api.types.is_list_like(labels) \
+                    else [labels]
+            if pd.api.types.is_list_like(key) and \
+                    all(x in self.columns for x in key):
+                return list(key)
+            if not isinstance(key, slice) and key in self.columns:
+                return [key]
+        except (TypeError, IndexError):
+            pass
+        return None
+
+    @property
+    def loc(self):
+        return _TrackedIndexer(super(TrackedDataFrame, self).loc, self, False)
+
+    @property
+    def iloc(self):
+        return _TrackedIndexer(super(TrackedDataFrame, self).iloc, self, True)
+
+    @property
+    def at(self):
+        return _TrackedIndexer(super(TrackedDataFrame, self).at, self, False)
+
+    @property
+    def iat(self):
+        return _TrackedIndexer(super(TrackedDataFrame, self).iat, self, True)
+
+
+class _TrackedIndexer(object):
+    """Wraps the pandas indexers to mark the assigned columns as changed."""
+
+    def __init__(self, indexer, frame, positional):
+        self._indexer = indexer
+        self._frame = frame
+        self._positional = positional
+
+    def __getattr__(self, name):
+        return getattr(self._indexer, name)
+
+    def __call__(self, *args, **kwargs):
+        return _TrackedIndexer(
+            self._indexer(*args, **kwargs), self._frame, self._positional
+        )
+
+    def __getitem__(self, key):
+        return self._indexer[key]
+
+    def __setitem__(self, key, value):
+        columns = self._frame._indexed_columns(key, self._positional)
+        self._frame._writable(columns)
+        self._frame._track(
+            lambda: self._indexer.__setitem__(key, value), columns
+        )
+
+
+# #============================================================================
+# FORMAT CLASSES
+# #============================================================================
+
+
+class Format(object):
+    """Base class for the file formats of the column files. A file holds a
+    single column, or only the index of the dataframe."""
+    name = ""
+    extension = ""
+    requires = None
+    codecs = ()
+    # packages that codecs need besides the format itself
+    codec_requires = {}
+
+    @classmethod
+    def available(cls):
+        return cls.requires is None or util.find_spec(cls.requires) is not None
+
+    @classmethod
+    def codec_available(cls, compression):
+        package = cls.codec_requires.get(compression)
+        return package is None or util.find_spec(package) is not None
+
+    def suffix(self, compression):
+        """Returns the extension of files compressed with the codec"""
+        return self.extension
+
+    def read(self, path, compression=None, strings=None):
+        raise NotImplementedError
+
+    def write(self, dataframe, path, index=False, compression=None,
+              level=None):
+        raise NotImplementedError
+
+    def open_writer(self, path, schema, compression=None, level=None):
+        """Returns a writer that appends arrow tables to a file"""
+        raise NotImplementedError
+
+
+class JsonFormat(Format):
+    """JSON table schema, which keeps dtypes such as categories."""
+    name = "json"
+    extension = ".json"
+    codecs = ("gzip", "zstd")
+    suffixes = {"gzip": ".gz", "zstd": ".zst"}
+    levels = {"gzip": "compresslevel", "zstd": "level"}
+    codec_requires = {"zstd": "zstandard"}
+
+    def suffix(self, compression):
+        return self.extension + self.suffixes.get(compression, "")
+
+    def read(self, path, compression=None, strings=None):
+        return pd.read_json(path, orient="table",
+                            compression=compression or "infer")
+
+    def write(self, dataframe, path, index=False, compression=None,
+              level=None):
+        if compression is not None:
+            compression = {"method": compression}
+            if level is not None:
+                compression[self.levels[compression["method"]]] = level
+        dataframe.to_json(path, orient="table", index=index,
+                          compression=compression)
+
+
+class ArrowFormat(Format):
+    """Shared logic for the columnar formats provided by pyarrow."""
+    requires = "pyarrow"
+
+    def read(self, path, compression=None, strings=None):
+        # the codec is stored in the file itself
+        # split_blocks avoids consolidating columns into new memory
+        return self._read_table(path).to_pandas(
+            split_blocks=True, types_mapper=types_mapper(strings)
+        )
+
+    def write(self, dataframe, path, index=False, compression=None,
+              level=None):
+        self._write_table(
+            pyarrow.Table.from_pandas(dataframe, preserve_index=index), path,
+            compression, level
+        )
+
+
+class ParquetFormat(ArrowFormat):
+    name = "parquet"
+    extension = ".parquet"
+    codecs = ("zstd", "lz4", "gzip")
+
+    def _read_table(self, path):
+        return pyarrow.parquet.read_table(path)
+
+    def _write_table(self, table, path, compression, level):
+        pyarrow.parquet.write_table(table, path,
+                                    compression=compression or "none",
+                                    compression_level=level)
+
+    def open_writer(self, path, schema, compression=None, level=None):
+        return pyarrow.parquet.ParquetWriter(path, schema,
+                                             compression=compression or
+                                             "none",
+                                             compression_level=level)
+
+
+class FeatherFormat(ArrowFormat):
+    """Arrow IPC (Feather v2) files. Uncompressed files can be
+    memory-mapped, which lets worker processes read row ranges straight
+    from the file without copying them."""
+    name = "feather"
+    extension = ".arrow"
+    codecs = ("zstd", "lz4")
+
+    def _read_table(self, path):
+        return pyarrow.feather.read_table(path, memory_map=True)
+
+    def _write_table(self, table, path, compression, level):
+        pyarrow.feather.write_feather(table, path,
+                                      compression=compression or
+                                      "uncompressed",
+                                      compression_level=level)
+
+    def open_writer(self, path, schema, compression=None, level=None):
+        # a feather file is an arrow IPC file of one or more record batches
+        codec = pyarrow.Codec(compression, level) if compression else None
+        options = pyarrow.ipc.IpcWriteOptions(compression=codec)
+        return pyarrow.ipc.new_file(path, schema, options=options)
+
+
+FORMATS = {x.name: x for x in (FeatherFormat, ParquetFormat, JsonFormat)}
+
+
+# #============================================================================
+# STORAGE CLASSES
+# #============================================================================
+
+
+class Storage(object):
+    """Columnar workspace storage. Every column of the dataframe is kept in
+    its own file inside the data folder, and a small manifest describes the
+    index and the file of each column. Saving a TrackedDataFrame only writes
+    the columns that changed since it was loaded or saved. Column files
+    can be compressed with any codec the format supports."""
+
+    def __init__(self, workspace, format="feather", compression=None,
+                 level=None, strings=None):
+        self.path = os.path.join(workspace, "data")
+        self.manifest_path = os.path.join(self.path, "manifest.json")
+        self.format = FORMATS[format]()
+        self.compression = compression
+        self.level = level if compression else None
+        self.strings = strings
+        self.statistics = None
+
+    def exists(self):
+        return os.path.isfile(self.manifest_path)
+
+    def manifest(self):
+        with open(self.manifest_path) as manifest_file:
+            return json.load(manifest_file)
+
+    def columns(self):
+        """Returns the column names without reading any data"""
+        return [x["name"] for x in self.manifest()["columns"]]
+
+    def read(self, columns=None):
+        """Reads the dataframe, or only the given columns"""
+        return TrackedDataFrame(read_manifest(
+            self.manifest(), columns,
+            lambda x: os.path.join(self.path, x["file"]), self.strings
+        ))
+
+    def write(self, dataframe):
+        """Writes the dataframe and returns the names of the written
+        columns"""
+        manifest = self.manifest() if self.exists() else None
+        dirty = None
+        if isinstance(dataframe, TrackedDataFrame):
+            dirty = dataframe.dirty
+        full = (manifest is None or dirty is None
+                or manifest["rows"] != len(dataframe))
+        os.makedirs(self.path, exist_ok=True)
+        stored = {}
+        if manifest is not None:
+            stored = {x["name"]: x for x in manifest["columns"]}
+        columns = []
+        written = []
+        start = perf_counter()
+        size = 0
+        for i, name in enumerate(dataframe.columns):
+            key = str(name)
+            if full or name in dirty or key not in stored:
+                series = dataframe.iloc[:, i]
+                columns.append(self._write_file(
+                    series.to_frame(name=key), str(series.dtype)
+                ))
+                columns[-1]["name"] = key
+                written.append(key)
+                size += series.memory_usage(index=False, deep=True)
+            else:
+                columns.append(stored[key])
+        if full:
+            index = self._write_index(dataframe.index)
+        else:
+            index = manifest["index"]
+        self.replace_manifest({
+            "version": 1,
+            "rows": len(dataframe),
+            "index": index,
+            "columns": columns,
+        }, manifest)
+        # the in-memory size of the written columns against their files
+        self.statistics = {
+            "columns": len(written),
+            "bytes": size,
+            "size": sum(os.path.getsize(os.path.join(self.path, x["file"]))
+                        for x in columns if x["name"] in written),
+            "seconds": perf_counter() - start,
+        }
+        if isinstance(dataframe, TrackedDataFrame):
+            dataframe.mark_clean()
+        return written
+
+    def appender(self):
+        """Returns an appender that replaces the stored dataframe with the
+        batches appended to it"""
+        return Appender(self)
+
+    def mapped_file(self, name):
+        """Returns the path of a column file that can be memory-mapped, or
+        None if the column is stored in another format"""
+        if not self.exists():
+            return None
+        for entry in self.manifest()["columns"]:
+            # every worker would decompress the whole file
+            if entry["name"] == name and entry["format"] == "feather" and \
+                    not entry.get("compression"):
+                return os.path.join(self.path, entry["file"])
+        return None
+
+    def replace_manifest(self, manifest, previous=None):
+        """Writes a new manifest and removes the files that only the
+        previous manifest referenced"""
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        os.replace(tmp, self.manifest_path)
+        if previous is None:
+            return
+        current = {x["file"] for x in entries(manifest)}
+        for entry in entries(previous):
+            path = os.path.join(self.path, entry["file"])
+            if entry["file"] not in current and os.path.exists(path):
+                os.remove(path)
+
+    def _write_file(self, dataframe, dtype, index=False):
+        # every write uses a new file, so a failed write never damages data
+        # referenced by the current manifest
+        filename = uuid.uuid4().hex + self.format.suffix(self.compression)
+        path = os.path.join(self.path, filename)
+        self.format.write(dataframe, path, index=index,
+                          compression=self.compression, level=self.level)
+        return {"file": filename, "format": self.format.name, "dtype": dtype,
+                "compression": self.compression, "hash": hash_file(path)}
+
+    def _write_index(self, index):
+        # a default index is described in the manifest instead of a file
+        if isinstance(index, pd.RangeIndex) and index.name is None:
+            return {"start": index.start, "stop": index.stop,
+                    "step": index.step}
+        return self._write_file(
+            pd.DataFrame(index=index), str(index.dtype), index=True
+        )
+
+
+class Appender(object):
+    """Writes a dataframe batch by batch, so it never has to fit in memory.
+    Every column is streamed into its own file, and the stored data is only
+    replaced once all batches are written. The batches must have the same
+    columns, and their dtypes must be compatible with the first batch."""
+
+    def __init__(self, store):
+        self.store = store
+        self.rows = 0
+        self._columns = None
+
+    def __enter__(self):
+        os.makedirs(self.store.path, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def append(self, batch):
+        if self._columns is None:
+            self._columns = [self._open(batch.iloc[:, i], str(name))
+                             for i, name in enumerate(batch.columns)]
+        elif [str(x) for x in batch.columns] != \
+                [x["name"] for x in self._columns]:
+            raise ValueError("Batches must have the same columns.")
+        for i, column in enumerate(self._columns):
+            column["writer"].write_table(
+                self._convert(batch.iloc[:, i], column)
+            )
+        self.rows += len(batch)
+
+    def close(self):
+        """Completes the files and replaces the stored dataframe"""
+        columns = []
+        for column in self._columns or []:
+            column["writer"].close()
+            columns.append({
+                "file": column["file"], "format": self.store.format.name,
+                "dtype": column["dtype"],
+                "compression": self.store.compression,
+                "hash": hash_file(column["path"]), "name": column["name"]
+            })
+        manifest = self.store.manifest() if self.store.exists() else None
+        self.store.replace_manifest({
+            "version": 1,
+            "rows": self.rows,
+            "index": {"start": 0, "stop": self.rows, "step": 1},
+            "columns": columns,
+        }, manifest)
+
+    def abort(self):
+        """Removes the files written so far"""
+        for column in self._columns or []:
+            try:
+                column["writer"].close()
+            except Exception:
+                pass
+            if os.path.exists(column["path"]):
+                os.remove(column["path"])
+
+    def _open(self, series, name):
+        filename = uuid.uuid4().hex + \
+            self.store.format.suffix(self.store.compression)
+        path = os.path.join(self.store.path, filename)
+        schema = pyarrow.Table.from_pandas(
+            series.to_frame(name=name), preserve_index=False
+        ).schema
+        # the dtype of the first batch, later batches are converted to it
+        return {"name": name, "file": filename, "path": path,
+                "dtype": str(series.dtype), "schema": schema,
+                "writer": self.store.format.open_writer(
+                    path, schema, self.store.compression, self.store.level
+                )}
+
+    def _convert(self, series, column):
+        schema = column["schema"]
+        try:
+            return pyarrow.Table.from_pandas(
+                series.to_frame(name=column["name"]), schema=schema,
+                preserve_index=False
+            )
+        except (pyarrow.ArrowException, TypeError, ValueError):
+            # empty values of a batch are read as another dtype
+            if series.isna().all():
+                return pyarrow.Table.from_arrays(
+                    [pyarrow.nulls(len(series), schema.field(0).type)],
+                    schema=schema
+                )
+            raise ValueError(
+                (f"Column '{column['name']}' changed from "
+                 + f"'{column['dtype']}' to '{series.dtype}' after "
+                 + f"{self.rows} rows. Set its dtype.")
+            )
+
+
+class Writer(object):
+    """Writes dataframes to a storage on a background thread, so saving
+    doesn't block the console. A save requested while another one is still
+    pending replaces it and only the latest dataframe is written. The
+    storage replaces its manifest atomically, so an interrupted save never
+    leaves a half-written workspace."""
+
+    def __init__(self):
+        self.saving = False
+        self.coalesced = 0
+        self.saved = None
+        self.written = []
+        self.error = None
+        self.statistics = None
+        self.completed = []
+        self._pending = None
+        self._failed = set()
+        self._thread = None
+        self._condition = threading.Condition()
+
+    @property
+    def pending(self):
+        return self._pending is not None
+
+    def submit(self, store, dataframe, callback=None):
+        """Schedules writing the dataframe. A TrackedDataFrame is marked
+        clean, so only later changes are written by the next save. callback
+        is called on the writer thread with the written dataframe and the
+        names of the written columns."""
+        with self._condition:
+            dirty = None
+            if isinstance(dataframe, TrackedDataFrame):
+                dirty = dataframe.dirty
+            # the replaced save and a failed save still have to be written
+            dirty = _union(dirty, self._failed)
+            if self._pending is not None:
+                dirty = _union(dirty, self._pending[1].dirty)
+                self.coalesced += 1
+            self._pending = (store, self._detach(dataframe, dirty), callback)
+            if isinstance(dataframe, TrackedDataFrame):
+                dataframe.mark_clean()
+            if self._thread is None:
+                # not a daemon, so the interpreter completes saves on exit
+                self._thread = threading.Thread(target=self._run)
+                self._thread.start()
+
+    def wait(self, timeout=None):
+        """Waits until all saves are written and returns the error of the
+        last save, if it failed"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._thread is None, timeout)
+            return self.error
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._pending is None:
+                    self.saving = False
+                    self._thread = None
+                    self._condition.notify_all()
+                    return
+                store, dataframe, callback = self._pending
+                self._pending = None
+                self.saving = True
+            try:
+                written = store.write(dataframe)
+            except Exception as e:
+                with self._condition:
+                    # the changes are written by the next save
+                    self._failed = _union(self._failed, dataframe.dirty)
+                    self.error = e
+            else:
+                with self._condition:
+                    self._failed = set()
+                    self.error = None
+                    self.written = written
+                    self.saved = datetime.now()
+                    self.statistics = store.statistics
+                    self.completed.append(store.statistics)
+                if callback is not None:
+                    try:
+                        callback(dataframe, written)
+                    except Exception as e:
+                        with self._condition:
+                            self.error = e
+
+    @staticmethod
+    def _detach(dataframe, dirty):
+        # copy only the data to write, since the dataframe keeps changing on
+        # the main thread; the other columns are only counted
+        if dirty is None:
+            frame = TrackedDataFrame(dataframe.copy())
+            frame._full = True
+            return frame
+        frame = TrackedDataFrame(dataframe.copy(deep=False))
+        for column in dirty:
+            if column in frame.columns:
+                frame[column] = dataframe[column].copy()
+        return frame
+
+
+class SnapshotStore(object):
+    """Content-addressed snapshot store for workspaces without SVN. Column
+    files are kept once in the objects folder under the hash of their
+    content and a snapshot is a copy of the manifest. Column files are
+    never modified after they are written, so objects are hard links to
+    them where the file system allows it. Taking, loading and removing a
+    snapshot therefore only costs the columns that changed."""
+
+    def __init__(self, workspace):
+        self.objects_path = os.path.join(workspace, "objects")
+        self.snapshots_path = os.path.join(workspace, "snapshots")
+
+    def exists(self, snapshot):
+        return os.path.isfile(self._snapshot_path(snapshot))
+
+    def manifest(self, snapshot):
+        with open(self._snapshot_path(snapshot)) as manifest_file:
+            return json.load(manifest_file)
+
+    def take(self, store, snapshot):
+        """Stores the current data of the storage and returns the number of
+        new objects"""
+        manifest = store.manifest()
+        count = 0
+        hashed = False
+        for entry in entries(manifest):
+            path = os.path.join(store.path, entry["file"])
+            # manifests written before hashing was added
+            if "hash" not in entry:
+                entry["hash"] = hash_file(path)
+                hashed = True
+            obj = self._object_path(entry)
+            if not os.path.exists(obj):
+                os.makedirs(os.path.dirname(obj), exist_ok=True)
+                link(path, obj)
+                count += 1
+        if hashed:
+            store.replace_manifest(manifest)
+        os.makedirs(self.snapshots_path, exist_ok=True)
+        with open(self._snapshot_path(snapshot), "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        return count
+
+    def load(self, store, snapshot):
+        """Replaces the data of the storage with the snapshot and returns the
+        number of restored files"""
+        manifest = self.manifest(snapshot)
+        previous = store.manifest() if store.exists() else None
+        # keep the files of columns that did not change
+        files = {}
+        if previous is not None:
+            files = {x.get("hash"): x["file"] for x in entries(previous)}
+        os.makedirs(store.path, exist_ok=True)
+        count = 0
+        for entry in entries(manifest):
+            if entry["hash"] in files:
+                entry["file"] = files[entry["hash"]]
+                continue
+            entry["file"] = (f"{uuid.uuid4().hex}"
+                             + os.path.splitext(entry["file"])[1])
+            link(self._object_path(entry),
+                 os.path.join(store.path, entry["file"]))
+            count += 1
+        store.replace_manifest(manifest, previous)
+        return count
+
+    def read(self, snapshot, columns=None):
+        """Reads the given columns of a snapshot without loading it"""
+        return read_manifest(self.manifest(snapshot), columns, self.locate)
+
+    def locate(self, entry):
+        return self._object_path(entry)
+
+    def remove(self, snapshot):
+        """Removes the snapshot. Its objects are removed by collect."""
+        os.remove(self._snapshot_path(snapshot))
+
+    def collect(self):
+        """Removes objects that no snapshot refers to and returns the number
+        of removed objects and their size in bytes"""
+        referenced = set()
+        if os.path.isdir(self.snapshots_path):
+            for filename in os.listdir(self.snapshots_path):
+                snapshot = os.path.splitext(filename)[0]
+                referenced.update(
+                    os.path.basename(self._object_path(x))
+                    for x in entries(self.manifest(snapshot))
+                )
+        count = size = 0
+        if not os.path.isdir(self.objects_path):
+            return count, size
+        for dirpath, dirnames, filenames in os.walk(self.objects_path):
+            for filename in filenames:
+                if filename not in referenced:
+                    path = os.path.join(dirpath, filename)
+                    size += os.path.getsize(path)
+                    os.remove(path)
+                    count += 1
+        return count, size
+
+    def _snapshot_path(self, snapshot):
+        return os.path.join(self.snapshots_path, f"{snapshot}.json")
+
+    def _object_path(self, entry):
+        name = entry["hash"] + os.path.splitext(entry["file"])[1]
+        return os.path.join(self.objects_path, name[:2], name)
+
+
+def _union(a, b):
+    # None stands for all columns
+    if a is None or b is None:
+        return None
+    return a | b
+
+
+def read_manifest(manifest, columns=None, locate=None, strings=None):
+    """Reads the columns described by a manifest. locate returns the path
+    (or a file object) of the file of a manifest entry, and strings selects
+    the dtype of text columns."""
+    stored = {x["name"]: x for x in manifest["columns"]}
+    if columns is None:
+        columns = [x["name"] for x in manifest["columns"]]
+    missing = [x for x in columns if x not in stored]
+    if missing:
+        raise KeyError(f"{missing} not in columns")
+    index = manifest["index"]
+    if "file" in index:
+        index = _read_entry(index, locate).index
+    else:
+        index = pd.RangeIndex(index["start"], index["stop"], index["step"])
+    parts = [_read_column(stored[x], locate, strings) for x in columns]
+    if not parts:
+        return pd.DataFrame(index=index)
+    dataframe = pd.concat(parts, axis=1, copy=False)
+    dataframe.index = index
+    return dataframe
+
+
+def _read_entry(entry, locate, strings=None):
+    return FORMATS[entry["format"]]().read(
+        locate(entry), compression=entry.get("compression"), strings=strings
+    )
+
+
+def _read_column(entry, locate, strings=None):
+    part = _read_entry(entry, locate, strings)
+    # formats without a dtype, such as JSON for int8 columns, read a wider
+    # one, so the dtype the column was saved with is restored. Text columns
+    # get the dtype selected for strings instead.
+    text = strings and entry["dtype"] in ("object", "string")
+    if not text and str(part.dtypes.iloc[0]) != entry["dtype"]:
+        try:
+            part = part.astype(entry["dtype"])
+        except (TypeError, ValueError):
+            pass
+    if text:
+        part = convert_strings(part, strings)
+    return part
+
+
+def convert_strings(dataframe, strings):
+    """Converts the text columns of the dataframe in place to strings kept
+    in arrow memory ('pyarrow'), or to Python objects ('object')"""
+    for i in range(len(dataframe.columns)):
+        series = dataframe.iloc[:, i]
+        if strings == "pyarrow" and pd.api.types.is_object_dtype(series) \
+                and pd.api.types.infer_dtype(series, skipna=True) in \
+                ("string", "empty"):
+            dataframe.isetitem(i, series.astype(pd.StringDtype("pyarrow")))
+        elif strings == "object" and \
+                isinstance(series.dtype, pd.StringDtype):
+            dataframe.isetitem(i, series.astype(object))
+    return dataframe
+
+
+def types_mapper(strings):
+    """Returns the types_mapper for converting arrow tables to pandas that
+    keeps strings in arrow memory, if selected"""
+    if strings != "pyarrow":
+        return None
+    text = (pyarrow.string(), pyarrow.large_string())
+    return lambda x: pd.StringDtype("pyarrow") if x in text else None
+
+
+def compare(a, b):
+    """Compares two manifests and returns the changed columns as a list of
+    (column, change) tuples"""
+    a_entries = {x["name"]: x for x in a["columns"]}
+    b_entries = {x["name"]: x for x in b["columns"]}
+    changes = []
+    for name in a_entries:
+        if name not in b_entries:
+            changes.append((name, "removed"))
+        elif a_entries[name].get("dtype") != b_entries[name].get("dtype"):
+            changes.append((name, "dtype"))
+        elif a_entries[name].get("hash") is None or \
+                a_entries[name].get("hash") != b_entries[name].get("hash"):
+            changes.append((name, "modified"))
+    for name in b_entries:
+        if name not in a_entries:
+            changes.append((name, "added"))
+    return changes
+
+
+def entries(manifest):
+    """Returns the manifest entries that refer to a file"""
+    result = list(manifest["columns"])
+    if "file" in manifest["index"]:
+        result.append(manifest["index"])
+    return result
+
+
+def hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def link(src, dst):
+    """Hard links a file and falls back to copying it"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def read_legacy(path):
+    """Reads the single file layouts written by earlier versions"""
+    if path.endswith(".json"):
+        return pd.read_json(path)
+    if path.endswith(".parquet"):
+        return pyarrow.parquet.read_table(path).to_pandas()
+    return pyarrow.feather.read_table(path).to_pandas()
@@ -40,6 +40,8 @@ def run_module(workspace, module):
         # execute the task
         module = computist._loaded_modules.get(module)
         module.run()
+        # the job is finished once the dataframe is saved
+        module.flush_dataframe()
     except Exception as e:
         results["error"] = {
             "type": str(type(e)),
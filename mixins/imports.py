@@ -0,0 +1,204 @@
+"""
+Copyright (c) 2021 Jan William Johnsen
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from contextlib import closing
+import glob
+import json
+import os
+import pandas as pd
+from importlib import util
+if util.find_spec('orjson'):
+    import orjson
+# framework libs
+from core import storage
+from core.framework import FrameworkException
+from mixins.processes import ProcessingMixin
+
+# orjson decodes several times faster than the standard library
+loads = orjson.loads if util.find_spec('orjson') else json.loads
+
+
+def read_json_lines(path, chunksize=None, fields=None, flatten=False):
+    """Parses a JSON Lines (NDJSON) file, or yields batches of chunksize
+    rows. fields are the fields to keep, where '.' separates the fields of
+    nested objects, and flatten turns nested objects into columns."""
+    batches = _read_json_lines(path, chunksize or 100000, fields, flatten)
+    if chunksize:
+        return batches
+    frames = list(batches)
+    if not frames:
+        return pd.DataFrame(columns=fields)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_json_lines(path, chunksize, fields, flatten):
+    columns = None
+    records = []
+    with open(path, "rb", buffering=1 << 20) as lines:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = loads(line)
+            if fields:
+                record = {x: _lookup(record, x) for x in fields}
+            records.append(record)
+            if len(records) == chunksize:
+                frame = _to_frame(records, fields, flatten, columns)
+                columns = frame.columns
+                yield frame
+                records = []
+    if records:
+        yield _to_frame(records, fields, flatten, columns)
+
+
+def _lookup(record, field):
+    for key in field.split("."):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+
+def _to_frame(records, fields, flatten, columns):
+    if flatten:
+        frame = pd.json_normalize(records, sep=".")
+    else:
+        frame = pd.DataFrame.from_records(records, columns=fields)
+    # the columns of the first batch are kept, so all batches match
+    if columns is not None:
+        frame = frame.reindex(columns=columns)
+    return frame
+
+
+READERS = {
+    "csv": pd.read_csv,
+    "json": pd.read_json,
+    "jsonl": read_json_lines,
+}
+
+
+def read_file(path, reader, kwargs, source=None):
+    """Parses a file, in a worker process when several files are imported"""
+    dataframe = READERS[reader](path, **kwargs)
+    if source:
+        dataframe[source] = path
+    return dataframe
+
+
+def concat(frames):
+    """Concatenates the dataframes of several files. Columns get the common
+    dtype of the files, and categorical columns keep the union of their
+    categories instead of falling back to objects."""
+    columns = dict.fromkeys(x for frame in frames for x in frame.columns)
+    for column in columns:
+        series = [frame[column] for frame in frames if column in frame]
+        if all(isinstance(x.dtype, pd.CategoricalDtype) for x in series):
+            dtype = pd.CategoricalDtype(pd.api.types.union_categoricals(
+                series, ignore_order=True
+            ).categories)
+            for frame in frames:
+                if column in frame:
+                    frame[column] = frame[column].astype(dtype)
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+
+def optimize(dataframe, ratio=0.5):
+    """Downcasts numeric columns and converts string columns to categories
+    if their share of distinct values is at most ratio. Returns the
+    changed columns as (column, old dtype, new dtype) tuples."""
+    changes = []
+    for column in dataframe.columns:
+        series = dataframe[column]
+        optimized = None
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        elif pd.api.types.is_integer_dtype(series):
+            optimized = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            optimized = pd.to_numeric(series, downcast="float")
+            # only keep the smaller floats if no values are rounded
+            if not (optimized.astype(series.dtype) == series).where(
+                    series.notna(), True).all():
+                optimized = None
+        elif pd.api.types.is_object_dtype(series) and \
+                pd.api.types.infer_dtype(series, skipna=True) == "string":
+            if series.nunique() <= ratio * len(series):
+                optimized = series.astype("category")
+        if optimized is not None and optimized.dtype != series.dtype:
+            dataframe[column] = optimized
+            changes.append((column, str(series.dtype), str(optimized.dtype)))
+    return changes
+
+
+class ImportMixin(ProcessingMixin):
+
+    def optimize_dataframe(self, ratio=0.5):
+        """Optimizes the dtypes of the dataframe and reports the memory it
+        saves"""
+        before = self.dataframe.memory_usage(index=False, deep=True)
+        changes = optimize(self.dataframe, ratio)
+        after = self.dataframe.memory_usage(index=False, deep=True)
+        if not changes:
+            self.output("No dtypes to optimize.")
+            return
+        self.table(
+            [[column, old, new, self._format_size(before[column]),
+              self._format_size(after[column])]
+             for column, old, new in changes],
+            header=["Column", "Dtype", "New dtype", "Memory", "New memory"]
+        )
+        self.output(
+            (f"Memory usage: {self._format_size(before.sum())} => "
+             + f"{self._format_size(after.sum())}")
+        )
+
+    def expand_files(self, path, extensions=()):
+        """Returns the files of a path, glob pattern or directory. Only the
+        files with the given extensions are taken from a directory."""
+        path = os.path.expanduser(path)
+        if os.path.isdir(path):
+            files = [os.path.join(path, x) for x in os.listdir(path)
+                     if not extensions or
+                     os.path.splitext(x)[1].lower() in extensions]
+        else:
+            files = glob.glob(path, recursive=True)
+        files = sorted(x for x in files if os.path.isfile(x))
+        if not files:
+            raise FrameworkException(f"No files found at '{path}'.")
+        return files
+
+    def import_files(self, reader, files, source=None, **kwargs):
+        """Parses the files in parallel and returns them as one dataframe.
+        source names a column that stores the file of every row."""
+        if len(files) == 1:
+            dataframe = read_file(files[0], reader, kwargs, source)
+        else:
+            dataframe = concat(self.process_items(read_file, files, reader,
+                                                  kwargs, source))
+        return storage.convert_strings(dataframe,
+                                       self._global_options["strings"])
+
+    def read_batches(self, reader, files, chunksize, source=None, **kwargs):
+        """Yields batches of rows of the files one after another, so they
+        can be written to the storage without reading all files at once"""
+        for path in files:
+            with closing(READERS[reader](path, chunksize=chunksize,
+                                         **kwargs)) as batches:
+                for batch in batches:
+                    if source:
+                        batch[source] = path
+                    yield batch
@@ -3,6 +3,21 @@ Copyright (c) 2021 Jan William Johnsen
 2021-03-19: Simplified this code so modules no longer must sort *args in the
 beginning of execution. It also has better exception handling. Added a progress
 bar to indicate the processing progress for chunks.
+2026-10-18: 1) Workers read unmodified workspace columns from the
+memory-mapped column files instead of receiving pickled chunks. 2) Added
+process_items for calling a function on every item in parallel. 3) Mapped
+chunks keep text as arrow strings when selected. 4) Chunks are processed on
+the framework's persistent worker pool instead of a new pool per call.
+5) Other chunks and the results are passed through arrow files in shared
+memory instead of being pickled. 6) The arguments of a call are sent once
+to every worker, which keeps them, prepared, for the following chunks. 7)
+Text is split into chunks of balanced length that get smaller towards the
+end of the data. 8) The chunks are sized by timing a probe of the first rows,
+and small workloads are processed serially. 9) Progress is reported from
+the completion message of every chunk, on the console or in the meta data of
+the current job. 10) A frame of several columns is processed in one pass,
+column by column in every chunk. 11) Added process_stage for the modules
+that replace their columns with the results of a single process function.
 
 This program is free software: you can redistribute it and/or modify
 it under the terms of the GNU General Public License as published by
@@ -21,67 +36,620 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
 import sys
 import time
-import signal
+import pickle
+import shutil
+import hashlib
+import tempfile
+import threading
 import pandas as pd
 import numpy as np
-import multiprocessing as mp
+from collections import OrderedDict
 from datetime import timedelta
 from time import perf_counter
 from importlib import util
 if util.find_spec('tqdm'):
     from tqdm import tqdm
+if util.find_spec('pyarrow'):
+    import pyarrow.feather
+if util.find_spec('psutil'):
+    import psutil
+elif util.find_spec('resource'):
+    import resource
+if util.find_spec('rq'):
+    from rq import get_current_job
+# framework libs
+from core import storage
 
 # https://github.com/ContinuumIO/anaconda-issues/issues/905
 os.environ['FOR_DISABLE_CONSOLE_CTRL_HANDLER'] = '1'
 
+# files in this directory are kept in memory on Linux
+SHARED_PATH = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# planning of processes calls: the probe runs until it takes PROBE_SECONDS or
+# covers PROBE_SHARE of the work, and chunks should take CHUNK_SECONDS. The
+# parallel estimate adds the overhead of every chunk, of moving the data and
+# of starting the workers if they are not running.
+PROBE_SECONDS = 0.05
+PROBE_SHARE = 0.01
+CHUNK_SECONDS = 0.5
+MAX_CHUNKS = 4096
+DISPATCH_SECONDS = 0.002
+TRANSFER_SECONDS = 1e-8
+START_SECONDS = 1.0
+
+# chunks that take at least STRAGGLER_SECONDS and process their data
+# STRAGGLER_FACTOR times slower than the median chunk are stragglers
+STRAGGLER_FACTOR = 3
+STRAGGLER_SECONDS = 0.1
+
+# broadcast arguments a worker has prepared, by function and content
+_RESIDENT = OrderedDict()
+RESIDENT_SIZE = 8
+
+
+def prepare_args(func, args):
+    """Returns the arguments of func as its prepare hook returns them, such
+    as sets or compiled regexes built from plain lists. The hook is set as
+    the 'prepare' attribute of the function."""
+    prepare = getattr(func, "prepare", None)
+    if prepare is None:
+        return args
+    return tuple(prepare(*args))
+
+
+def _to_arrow(series):
+    """Returns the series as an arrow array, or None when the conversion
+    would not give back the same values, such as for lists in objects"""
+    if series.dtype == object and pd.api.types.infer_dtype(
+            series, skipna=True) not in ("string", "empty"):
+        return None
+    try:
+        return pyarrow.Array.from_pandas(series)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        return None
+
+
+def _write_arrow(arrays, path):
+    """Writes the arrays to an arrow file and returns whether it was
+    written, as the shared directory may be too small for the data"""
+    table = pyarrow.table({str(i): x for i, x in enumerate(arrays)})
+    try:
+        pyarrow.feather.write_feather(table, path,
+                                      compression="uncompressed")
+    except OSError:
+        _remove(path)
+        return False
+    return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _to_pandas(table, names, strings, frame):
+    """Converts every column of the table with its own text dtype, to a
+    frame or to a series for a single column"""
+    columns = []
+    for i, name in enumerate(names):
+        column = table.select([i]).to_pandas(
+            types_mapper=storage.types_mapper(strings[i])
+        ).iloc[:, 0]
+        column.name = name
+        columns.append(column)
+    return pd.concat(columns, axis=1) if frame else columns[0]
+
+
+def _call(func, data, args):
+    """Calls func on the data, or on every column of a frame"""
+    if isinstance(data, pd.DataFrame):
+        # the columns are taken by position, as their names may repeat
+        result = pd.DataFrame({i: func(data.iloc[:, i], *args)
+                               for i in range(data.shape[1])},
+                              index=data.index)
+        result.columns = data.columns
+        return result
+    return func(data, *args)
+
+
+def _same_memory(a, b):
+    """Returns whether the series hold the same values in the same memory,
+    numpy arrays or the buffers of arrow arrays such as text columns"""
+    if isinstance(a.values, np.ndarray) and isinstance(b.values, np.ndarray):
+        return np.may_share_memory(a.values, b.values)
+    a = getattr(a.array, "_pa_array", None)
+    b = getattr(b.array, "_pa_array", None)
+    return a is not None and b is not None and _buffers(a) == _buffers(b)
+
+
+def _buffers(data):
+    # the position and memory of every chunk of an arrow array
+    return [(x.offset, len(x), [y.address for y in x.buffers()
+                                    if y is not None])
+            for x in data.chunks]
+
+
+def _size(item):
+    """Returns the number of rows and bytes of a chunk, or of a file"""
+    if isinstance(item, pd.DataFrame):
+        return len(item), int(item.memory_usage(deep=True, index=False).sum())
+    if isinstance(item, pd.Series):
+        return len(item), int(item.memory_usage(deep=True, index=False))
+    if isinstance(item, str) and os.path.isfile(item):
+        return 1, os.path.getsize(item)
+    return 1, 0
+
+
+def _rss():
+    """Returns the resident memory of the process in bytes, or its peak
+    without psutil"""
+    if "psutil" in sys.modules:
+        return psutil.Process().memory_info().rss
+    if "resource" in sys.modules:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+
+class MappedChunk(object):
+    """Row range of a memory-mapped column file. Workers receive this instead
+    of the pickled rows and read the range from the shared file mapping."""
+
+    def __init__(self, path, name, start, stop, strings=None, output=None):
+        self.path = path
+        self.name = name
+        self.start = start
+        self.stop = stop
+        self.strings = strings
+        # file for the result of the chunk, if it can be shared
+        self.output = output
+
+    def load(self):
+        table = pyarrow.feather.read_table(self.path, memory_map=True)
+        data = table.slice(self.start, self.stop - self.start).to_pandas(
+            types_mapper=storage.types_mapper(self.strings)
+        )
+        data = data.iloc[:, 0]
+        # rows are indexed by position, the parent restores the index
+        data.index = pd.RangeIndex(self.start, self.stop)
+        data.name = self.name
+        return data
+
+
+class MappedFrame(object):
+    """Row range of several memory-mapped column files, which the worker
+    loads as one frame"""
+
+    def __init__(self, chunks, output=None):
+        self.chunks = chunks
+        self.output = output
+
+    def load(self):
+        return pd.concat([x.load() for x in self.chunks], axis=1)
+
+
+class Broadcast(object):
+    """Arguments of a processes call, pickled once to the shared directory.
+    The chunks carry this instead of the arguments, and every worker loads
+    and prepares them on its first chunk only."""
+
+    def __init__(self, func, args, directory):
+        data = pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha1(data).hexdigest()
+        self.key = (func.__module__, func.__qualname__, digest)
+        self.path = os.path.join(directory, f"{digest}.pickle")
+        try:
+            with open(self.path, "wb") as f:
+                f.write(data)
+        except OSError:
+            _remove(self.path)
+            raise
+
+    def load(self, func):
+        args = _RESIDENT.get(self.key)
+        if args is None:
+            with open(self.path, "rb") as f:
+                args = prepare_args(func, pickle.load(f))
+            _RESIDENT[self.key] = args
+            # only keep the arguments of the most recent calls
+            while len(_RESIDENT) > RESIDENT_SIZE:
+                _RESIDENT.popitem(last=False)
+        else:
+            _RESIDENT.move_to_end(self.key)
+        return args
+
+
+class SharedResult(object):
+    """Result of a chunk that a worker wrote to an arrow file. The parent
+    reads all result files as one table instead of unpickling every
+    chunk."""
+
+    def __init__(self, path, names, strings, frame=False, start=0):
+        self.path = path
+        self.names = names
+        self.strings = strings
+        self.frame = frame
+        # position of the first row, as the chunks are indexed by position
+        self.start = start
+
+    @classmethod
+    def dump(cls, result, index, path):
+        """Writes the result to the path if it is a series or frame of the
+        rows of the index that arrow can hold, and returns it as it is
+        otherwise"""
+        if not isinstance(result, (pd.Series, pd.DataFrame)) or \
+                not result.index.equals(index):
+            return result
+        frame = isinstance(result, pd.DataFrame)
+        columns = list(result.items()) if frame else [(result.name, result)]
+        arrays = [_to_arrow(column) for name, column in columns]
+        if any(array is None for array in arrays) or \
+                not _write_arrow(arrays, path):
+            return result
+        return cls(path, [name for name, column in columns],
+                   [getattr(column.dtype, "storage", None)
+                    for name, column in columns], frame,
+                   index[0] if len(index) else 0)
+
+    def load(self):
+        data = _to_pandas(pyarrow.feather.read_table(self.path), self.names,
+                          self.strings, self.frame)
+        data.index = pd.RangeIndex(self.start, self.start + len(data))
+        return data
+
+    @staticmethod
+    def gather(results):
+        """Returns the shared results as one series or frame indexed by
+        position, or the list of results when not every chunk could be
+        shared"""
+        first = results[0] if results else None
+        if not isinstance(first, SharedResult) or any(
+                not isinstance(x, SharedResult)
+                or (x.names, x.strings, x.frame) !=
+                (first.names, first.strings, first.frame) for x in results):
+            return [x.load() if isinstance(x, SharedResult) else x
+                    for x in results]
+        tables = [pyarrow.feather.read_table(x.path, memory_map=True)
+                  for x in results]
+        try:
+            # chunks with only missing values have the null type, and
+            # chunks with missing numbers are double instead of int64
+            table = pyarrow.concat_tables(tables,
+                                          promote_options="permissive")
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            return [x.load() for x in results]
+        # one conversion for all chunks
+        return _to_pandas(table, first.names, first.strings, first.frame)
+
+
+class Progress(object):
+    """Progress of a parallel run, fed by the completion message of every
+    chunk. It is shown on a progress bar in the console, and kept in the
+    meta data of the current job when running as a job."""
+
+    def __init__(self, chunks, rows):
+        self.chunks = chunks
+        self.rows = rows
+        self.done = 0
+        self.rows_done = 0
+        self.bytes_done = 0
+        self.workers = {}
+        # (rows or bytes per second, pid, seconds) of completed chunks
+        self.rates = []
+        self.started = perf_counter()
+        self._saved = 0
+        self._lock = threading.Lock()
+        self.job = get_current_job() if "rq" in sys.modules else None
+        self.pbar = None
+        if self.job is None and "tqdm" in sys.modules:
+            self.pbar = tqdm(leave=False, total=rows, unit="rows")
+
+    def update(self, message):
+        """Callback for the (result, statistics) message of a chunk"""
+        stats = message[1]
+        with self._lock:
+            self.done += 1
+            self.rows_done += stats["rows"]
+            self.bytes_done += stats["bytes"]
+            worker = self.workers.setdefault(
+                stats["pid"], {"chunks": 0, "cpu": 0.0, "rss": None}
+            )
+            worker["chunks"] += 1
+            worker["cpu"] += stats["cpu"]
+            worker["rss"] = stats["rss"]
+            # compare chunks by bytes, as the rows of text differ in length
+            amount = stats["bytes"] or stats["rows"]
+            self.rates.append((amount / max(stats["seconds"], 1e-9),
+                               stats["pid"], stats["seconds"]))
+            if self.pbar is not None:
+                self.pbar.set_postfix_str(
+                    f"{self.mb_per_second:.1f} MB/s, "
+                    f"{len(self.stragglers())} stragglers", refresh=False
+                )
+                self.pbar.update(stats["rows"])
+            if self.job is not None and (self.done == self.chunks or
+                                         perf_counter() - self._saved >= 1):
+                self._save()
+
+    @property
+    def elapsed(self):
+        return perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows_done / max(self.elapsed, 1e-9)
+
+    @property
+    def mb_per_second(self):
+        return self.bytes_done / 2**20 / max(self.elapsed, 1e-9)
+
+    @property
+    def eta(self):
+        """Estimated seconds until all rows are processed"""
+        if not self.rows_done:
+            return None
+        return (self.rows - self.rows_done) / self.rows_per_second
+
+    def stragglers(self):
+        """Returns the (rate, pid, seconds) of the chunks that were
+        STRAGGLER_FACTOR times slower than the median chunk"""
+        if len(self.rates) < 2:
+            return []
+        median = np.median([x[0] for x in self.rates])
+        return [x for x in self.rates if x[2] >= STRAGGLER_SECONDS
+                and x[0] * STRAGGLER_FACTOR < median]
+
+    def status(self):
+        return {
+            "chunks": self.chunks,
+            "done": self.done,
+            "rows": self.rows,
+            "rows_done": self.rows_done,
+            "rows_per_second": self.rows_per_second,
+            "mb_per_second": self.mb_per_second,
+            "eta": self.eta,
+            "stragglers": len(self.stragglers()),
+            "workers": {str(pid): dict(worker)
+                        for pid, worker in self.workers.items()},
+        }
+
+    def close(self):
+        if self.pbar is not None:
+            self.pbar.close()
+            self.pbar = None
+        if self.job is not None:
+            with self._lock:
+                self._save()
+
+    def _save(self):
+        self.job.meta["progress"] = self.status()
+        self.job.save_meta()
+        self._saved = perf_counter()
+
 
 class ProcessingMixin():
 
     def processes(self, func, iterable, *args):
-        # disable multiprocessing in debug mode
-        if self._global_options["verbosity"] >= 2:
+        """Calls func(chunk, *args) on chunks of the iterable in parallel
+        and combines the results. For a frame, func is called on every
+        column of the chunk, so several columns take a single pass."""
+        return self._processes(func, iterable, args)
+
+    def process_columns(self, func, names, *args):
+        """Like processes(func, self.dataframe[names], *args), but the
+        workers read unmodified columns from the workspace storage, as
+        selecting several columns of the dataframe copies them"""
+        frame = self.dataframe
+        return self._processes(func, frame[names], args,
+                               [frame[name] for name in names])
+
+    def process_stage(self):
+        """Replaces the columns of the "column" option, separated with
+        comma, with the results of the function and arguments returned by
+        the module's stage(), which the pipeline module also composes with
+        the stages of other modules. All columns are processed in a single
+        pass."""
+        if "," in self.options["column"]:
+            columns = self.options["column"].replace(" ", "").split(",")
+        else:
+            columns = [self.options["column"]]
+        func, args = self.stage()
+        self.dataframe[columns] = self.process_columns(func, columns, *args)
+
+    def _processes(self, func, iterable, args, columns=None):
+        # disable multiprocessing in debug mode, or without data
+        if self._global_options["verbosity"] >= 2 or not len(iterable):
             # call the process method in serial
-            return func(iterable, *args)
+            return _call(func, iterable, prepare_args(func, args))
         # begin multiprocessing code
         process_count = self._global_options["processes"]
+        prepared = prepare_args(func, args)
+        costs = self._costs(func, iterable)
+        # estimate the work from a probe of the first rows
+        seconds = self._probe(func, iterable, prepared, costs) * costs.sum()
+        n, speedup = self._plan(seconds, costs, process_count)
+        if speedup < 1:
+            self.verbose(
+                f"Processing {len(iterable)} rows serially (estimated "
+                f"{seconds:.2f}s, parallel speedup {speedup:.1f}x)."
+            )
+            return _call(func, iterable, prepared)
         # split the data the queue from the user-defined iterable
-        n = self.chunksize(process_count, len(iterable))
-        data = [(func, chunk, *args) for chunk in np.array_split(iterable, n)]
+        ranges = list(self._balance(costs, process_count, n))
+        self.verbose(
+            f"Processing {len(iterable)} rows in {len(ranges)} chunks on "
+            f"{process_count} processes (estimated {seconds:.2f}s serial, "
+            f"parallel speedup {speedup:.1f}x)."
+        )
+        shared = tempfile.mkdtemp(prefix="computist-", dir=SHARED_PATH)
+        try:
+            sources = self._sources(iterable, shared, columns)
+            if sources:
+                chunks = []
+                for i, (start, stop) in enumerate(ranges):
+                    output = os.path.join(shared, f"{i}.arrow")
+                    columns = [MappedChunk(path, name, start, stop, strings)
+                               for path, name, strings in sources]
+                    if isinstance(iterable, pd.DataFrame):
+                        chunks.append(MappedFrame(columns, output))
+                    else:
+                        columns[0].output = output
+                        chunks.append(columns[0])
+            else:
+                chunks = [self._slice(iterable, start, stop)
+                          for start, stop in ranges]
+            if args:
+                try:
+                    # the chunks only carry a reference to the arguments
+                    args = (Broadcast(func, args, shared),)
+                except OSError:
+                    # the chunks carry the arguments themselves
+                    pass
+            data = [(func, chunk, *args) for chunk in chunks]
+            result = SharedResult.gather(
+                self._run_pool(data, len(iterable))
+            )
+        finally:
+            shutil.rmtree(shared, ignore_errors=True)
+        if isinstance(result, (pd.Series, pd.DataFrame)):
+            # the shared results are in the order of the rows
+            result.index = iterable.index
+        elif isinstance(result[0], (pd.Series, pd.DataFrame)):
+            # the results are in the order of the chunks
+            result = pd.concat(result)
+            if sources:
+                # mapped chunks are indexed by position
+                result.index = iterable.index[result.index]
+        return result
+
+    def process_items(self, func, items, *args):
+        """Calls func(item, *args) for every item in parallel and returns
+        the results in the order of the items. Suits items that are costly
+        on their own, such as files to parse."""
+        # disable multiprocessing in debug mode
+        if self._global_options["verbosity"] >= 2:
+            return [func(item, *args) for item in items]
+        return self._run_pool([(func, item, *args) for item in items])
+
+    def _run_pool(self, data, rows=None):
+        progress = Progress(len(data), len(data) if rows is None else rows)
         try:
-            # launch the processes
-            pool = mp.Pool(processes=process_count,
-                           initializer=self.initialize)
-            # chunksize=1 to prevent internal starmap_async chunking
-            result = pool.starmap_async(self._process_wrapper, data,
-                                        chunksize=1)
-            pool.close()
-            if "tqdm" in sys.modules:
-                pbar = tqdm(leave=False, total=n)
-                done = progress = 0
-                # display progress bar
-                while done < n:
-                    progress = (n - result._number_left) - done
-                    done += progress
-                    pbar.update(progress)
-                    time.sleep(0.1)
-                pbar.close()
-            pool.join()
+            processes = self._global_options["processes"]
+            method = self._global_options["start-method"]
+            if not self._workers.ready(processes, method) and \
+                    self._workers.forks(method):
+                # workers forked during a save would inherit the locks the
+                # writer thread holds, which are never released in them
+                self._writer.wait()
+            # reuse the session's worker processes
+            pool = self._workers.get(processes, method)
+            # one task per chunk, which reports its progress when completed
+            tasks = [pool.apply_async(self._process_wrapper, item,
+                                      callback=progress.update)
+                     for item in data]
+            for task in tasks:
+                task.wait()
         except KeyboardInterrupt:
+            # the messages go below the progress bar
+            progress.close()
             print("")
             self.error("Ok. Terminating processes...")
-            pool.close()
-            pool.terminate()
+            # the next call starts a new pool
+            self._workers.terminate()
             raise
-        result = result.get()
-        if isinstance(result[0], pd.Series):
-            result = pd.concat(result)
-            result.sort_index(inplace=True)
-        return result
+        finally:
+            # the progress bar is removed even if the pool can't start
+            progress.close()
+        self._report_progress(progress)
+        return [task.get()[0] for task in tasks]
+
+    def _report_progress(self, progress):
+        self.verbose(
+            f"Processed {progress.rows_done} rows in {progress.elapsed:.2f}s "
+            f"({progress.rows_per_second:,.0f} rows/s, "
+            f"{progress.mb_per_second:.1f} MB/s)."
+        )
+        for pid, worker in sorted(progress.workers.items()):
+            rss = "" if worker["rss"] is None else \
+                f", {worker['rss'] / 2**20:.0f} MB RSS"
+            self.verbose(
+                f"Worker {pid}: {worker['chunks']} chunks, "
+                f"{worker['cpu']:.2f}s CPU{rss}."
+            )
+        stragglers = progress.stragglers()
+        if stragglers:
+            pids = ", ".join(sorted({str(x[1]) for x in stragglers}))
+            self.alert(
+                f"{len(stragglers)} chunk(s) were {STRAGGLER_FACTOR}x slower "
+                f"than the median chunk (workers: {pids})."
+            )
+
+    def _sources(self, iterable, directory, columns=None):
+        """Returns the (path, name, strings) of an arrow file for every
+        column of the iterable, or of the given columns of the dataframe
+        it was selected from. Unmodified columns are read from the
+        workspace storage and others are written to the shared directory.
+        Returns None if arrow can't hold one of the columns."""
+        if "pyarrow" not in sys.modules:
+            return None
+        if isinstance(iterable, pd.Series):
+            columns = [iterable]
+        elif isinstance(iterable, pd.DataFrame) and \
+                iterable.columns.is_unique:
+            if columns is None:
+                columns = [iterable[name] for name in iterable.columns]
+        else:
+            return None
+        sources = []
+        for i, column in enumerate(columns):
+            path = self._mapped_file(column) or self._share(
+                column, os.path.join(directory, f"input-{i}.arrow")
+            )
+            if path is None:
+                return None
+            # the workers read text with the dtype of the column
+            sources.append((path, column.name,
+                            getattr(column.dtype, "storage", None)))
+        return sources
+
+    @staticmethod
+    def _share(series, path):
+        """Writes the series to an arrow file at the path and returns the
+        path, or None if arrow can't hold its values or the file can't be
+        written"""
+        array = _to_arrow(series)
+        if array is None or not _write_arrow([array], path):
+            return None
+        return path
+
+    def _mapped_file(self, iterable):
+        """Returns the column file of the workspace storage that holds the
+        iterable, if it is an unmodified column of the dataframe"""
+        # an unloaded dataframe is not read just to compare it
+        frame = self.peek_dataframe()
+        if not isinstance(iterable, pd.Series) or \
+                not isinstance(frame, storage.TrackedDataFrame):
+            return None
+        name = iterable.name
+        if name not in frame.columns or len(iterable) != len(frame):
+            return None
+        # make sure the iterable is the column itself and not a derivative
+        column = frame[name]
+        if not isinstance(column, pd.Series) or \
+                not _same_memory(iterable, column) or frame.is_dirty(name):
+            return None
+        # the column file is only current once pending saves are written
+        if self._writer.wait() is not None:
+            return None
+        return self._get_storage().mapped_file(str(name))
 
     def compare_serial_parallel(self, func, iterable, *args):
         # time and execute serial function
         start = perf_counter()
-        serial_results = func(iterable, *args)
+        serial_results = _call(func, iterable, prepare_args(func, args))
         end = perf_counter()
         duration = timedelta(seconds=end-start)
         self.output(f"Serial executed in {duration}.")
@@ -98,17 +666,110 @@ class ProcessingMixin():
 
     @staticmethod
     def _process_wrapper(func, iterable, *args):
-        return func(iterable, *args)
+        """Calls func on the chunk and returns the result with the
+        completion message of the chunk"""
+        started = perf_counter()
+        cpu = time.process_time()
+        if len(args) == 1 and isinstance(args[0], Broadcast):
+            args = args[0].load(func)
+        mapped = isinstance(iterable, (MappedChunk, MappedFrame))
+        chunk = iterable.load() if mapped else iterable
+        # measured first, as functions may modify their input
+        rows, nbytes = _size(chunk)
+        result = _call(func, chunk, args)
+        if mapped and iterable.output:
+            # hand the result back through the shared directory
+            result = SharedResult.dump(result, chunk.index, iterable.output)
+        return result, {
+            "pid": os.getpid(),
+            "rows": rows,
+            "bytes": nbytes,
+            "seconds": perf_counter() - started,
+            "cpu": time.process_time() - cpu,
+            "rss": _rss(),
+        }
+
+    @classmethod
+    def _costs(cls, func, iterable):
+        """Returns the cost of every row. Rows are weighed by the cost
+        function set as the 'cost' attribute of func, or by their length
+        if they are text, so that chunks of equal cost take about as long
+        to process. Other rows cost the same, and the rows of a frame cost
+        as much as their columns together."""
+        costs = None
+        if isinstance(iterable, pd.DataFrame):
+            costs = sum((cls._costs(func, iterable.iloc[:, i])
+                         for i in range(iterable.shape[1])),
+                        np.zeros(len(iterable)))
+        elif getattr(func, "cost", None) is not None:
+            costs = np.asarray(func.cost(iterable), dtype=float)
+        elif isinstance(iterable, pd.Series) and (
+                iterable.dtype == object
+                or isinstance(iterable.dtype, pd.StringDtype)):
+            try:
+                # every row also has a fixed overhead
+                costs = iterable.str.len().fillna(0).to_numpy(float) + 1
+            except AttributeError:
+                pass
+        if costs is None or not costs.sum() > 0:
+            return np.ones(len(iterable))
+        return costs
+
+    def _probe(self, func, iterable, args, costs):
+        """Times func on the first rows, doubling them until the call takes
+        PROBE_SECONDS or covers PROBE_SHARE of the cost, and returns the
+        seconds per unit of cost"""
+        cumsum = np.cumsum(costs)
+        rows = min(16, len(iterable))
+        while True:
+            # functions may modify their input
+            head = self._slice(iterable, 0, rows)
+            head = head.copy() if hasattr(head, "copy") else head
+            start = perf_counter()
+            _call(func, head, args)
+            elapsed = perf_counter() - start
+            if elapsed >= PROBE_SECONDS or rows == len(iterable) or \
+                    cumsum[rows - 1] >= cumsum[-1] * PROBE_SHARE:
+                return elapsed / cumsum[rows - 1]
+            rows = min(rows * 2, len(iterable))
+
+    def _plan(self, seconds, costs, n_workers):
+        """Returns the number of chunks that take CHUNK_SECONDS each, and
+        the estimated speedup of processing them in parallel"""
+        n = int(min(max(seconds / CHUNK_SECONDS, n_workers), MAX_CHUNKS,
+                    len(costs)))
+        parallel = (seconds / n_workers + n * DISPATCH_SECONDS
+                    + costs.sum() * TRANSFER_SECONDS)
+        if not self._workers.ready(n_workers,
+                                   self._global_options["start-method"]):
+            parallel += START_SECONDS
+        return n, seconds / parallel
 
     @staticmethod
-    def chunksize(n_workers, len_iterable, factor=8):
-        """Calculate chunksize.
-        Resembles mp.pool.Pool._map_async source code."""
-        chunksize, extra = divmod(len_iterable, n_workers * factor)
-        if extra:
-            chunksize += 1
-        return chunksize
+    def _balance(costs, n_workers, n):
+        """Yields (start, stop) row ranges by cumulative cost. Like guided
+        scheduling, every chunk takes a share of the remaining cost, so the
+        chunks shrink towards the end and the workers that are done first
+        take the small chunks. No chunk costs less than half of one in n
+        equal chunks, nor more than one of them. A chunk ends before the row
+        that would take it over its share, and a row that costs more than
+        the share by itself is a chunk of its own."""
+        cumsum = np.cumsum(costs)
+        total = cumsum[-1]
+        smallest = total / (2 * n)
+        start = 0
+        done = 0.0
+        while start < len(costs):
+            target = min(max((total - done) / (2 * n_workers), smallest),
+                         total / n)
+            stop = int(np.searchsorted(cumsum, done + target, side="right"))
+            stop = min(max(stop, start + 1), len(costs))
+            yield start, stop
+            done = cumsum[stop - 1]
+            start = stop
 
     @staticmethod
-    def initialize():
-        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    def _slice(iterable, start, stop):
+        if hasattr(iterable, "iloc"):
+            return iterable.iloc[start:stop]
+        return iterable[start:stop]
@@ -45,6 +45,8 @@ class ThreadingMixin(object):
                 )
             finally:
                 self.q.task_done()
+        # the thread's database connections are not used again
+        self._connections.release()
         self.debug(f"THREAD => {thread_name} exited.")
 
     # sometimes a keyboardinterrupt causes a race condition between when
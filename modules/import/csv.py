@@ -1,28 +1,62 @@
 from core.module import BaseModule
-import pandas as pd
+from mixins.imports import ImportMixin
 import os
 
 
-class Module(BaseModule):
+class Module(BaseModule, ImportMixin):
     meta = {
         "name": "Import from CSV file",
         "author": "Jan William Johnsen (@frozenbeer)",
-        "version": "1.0",
-        "description": "Import a dataset from a Comma Separated Values (CSV) "
-                       "file.",
+        "version": "1.3",
+        "description": "Import a dataset from Comma Separated Values (CSV) "
+                       "files. Several files, given by a glob pattern or a "
+                       "directory, are parsed in parallel. With a chunksize, "
+                       "the files are read and stored in batches of rows, so "
+                       "they do not have to fit in memory.",
         "options": (
-            ("file", "", True, "path to CSV file"),
+            ("file", "", True, "path, glob pattern or directory of CSV files"),
             ("sep", ",", True, "delimiter to use"),
-            ("engine", "c", True, "parser engine to use {'c', 'python'}")
+            ("engine", "c", True, "parser engine to use {'c', 'python'}"),
+            ("chunksize", None, False, "number of rows read per batch"),
+            ("usecols", None, False, "',' delimited columns to import"),
+            ("dtype", None, False,
+             "',' delimited column=dtype hints (e.g. id=int64,text=string)"),
+            ("source", None, False, "column to store the file of each row"),
+            ("optimize", False, True, "downcast numbers and store repeated "
+                                      "strings as categories")
         ),
     }
 
     def module_run(self):
-        self.dataframe = pd.read_csv(
-            self.options["file"],
-            sep=self.options["sep"],
-            engine=self.options["engine"]
-        )
-        filename = self.options["file"].split(os.sep)[-1]
+        kwargs = {"sep": self.options["sep"],
+                  "engine": self.options["engine"]}
+        if self.options["usecols"]:
+            kwargs["usecols"] = [
+                x.strip() for x in str(self.options["usecols"]).split(",")
+            ]
+        if self.options["dtype"]:
+            kwargs["dtype"] = dict(
+                [y.strip() for y in x.split("=", 1)]
+                for x in str(self.options["dtype"]).split(",")
+            )
+        files = self.expand_files(self.options["file"], [".csv"])
+        source = self.options["source"]
+        if len(files) == 1:
+            imported = f"'{files[0].split(os.sep)[-1]}'"
+        else:
+            imported = f"{len(files)} files"
+        if self.options["chunksize"]:
+            rows = self.write_dataframe(self.read_batches(
+                "csv", files, int(self.options["chunksize"]), source,
+                **kwargs
+            ))
+            self.output(f"Imported {imported} ({rows} rows).")
+            if self.options["optimize"]:
+                self.alert("Batched imports are not optimized, as it needs "
+                           + "the whole dataframe in memory.")
+            return
+        self.dataframe = self.import_files("csv", files, source, **kwargs)
+        if self.options["optimize"]:
+            self.optimize_dataframe()
         self.save_dataframe()
-        self.output(f"Imported '{filename}'.")
+        self.output(f"Imported {imported}.")
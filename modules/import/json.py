@@ -1,21 +1,66 @@
 from core.module import BaseModule
-import pandas as pd
+from mixins.imports import ImportMixin
 import os
 
 
-class Module(BaseModule):
+class Module(BaseModule, ImportMixin):
     meta = {
         "name": "Import from JSON file",
         "author": "Jan William Johnsen (@frozenbeer)",
-        "version": "1.0",
-        "description": "Import a dataset from a JSON file.",
+        "version": "1.3",
+        "description": "Import a dataset from JSON files. Several files, "
+                       "given by a glob pattern or a directory, are parsed "
+                       "in parallel. JSON Lines files are streamed record by "
+                       "record, and with a chunksize they are stored in "
+                       "batches of rows, so they do not have to fit in "
+                       "memory. Without fields, JSON Lines files keep the "
+                       "fields found in the first batch.",
         "options": (
-            ("file", "", True, "path to JSON file"),
+            ("file", "", True, "path, glob pattern or directory of JSON "
+                               "files"),
+            ("lines", False, True, "files are JSON Lines (one record per "
+                                   "line)"),
+            ("chunksize", None, False, "number of lines read per batch"),
+            ("fields", None, False, "',' delimited fields to import, '.' "
+                                    "separates nested fields"),
+            ("flatten", False, True, "flatten nested objects into columns"),
+            ("source", None, False, "column to store the file of each row"),
+            ("optimize", False, True, "downcast numbers and store repeated "
+                                      "strings as categories")
         ),
     }
 
     def module_run(self):
-        self.dataframe = pd.read_json(self.options["file"])
-        filename = self.options["file"].split(os.sep)[-1]
+        lines = self.options["lines"]
+        files = self.expand_files(
+            self.options["file"],
+            [".jsonl", ".ndjson", ".json"] if lines else [".json"]
+        )
+        source = self.options["source"]
+        if len(files) == 1:
+            imported = f"'{files[0].split(os.sep)[-1]}'"
+        else:
+            imported = f"{len(files)} files"
+        kwargs = {}
+        if lines:
+            kwargs["flatten"] = self.options["flatten"]
+            if self.options["fields"]:
+                kwargs["fields"] = [
+                    x.strip() for x in str(self.options["fields"]).split(",")
+                ]
+        if lines and self.options["chunksize"]:
+            rows = self.write_dataframe(self.read_batches(
+                "jsonl", files, int(self.options["chunksize"]), source,
+                **kwargs
+            ))
+            self.output(f"Imported {imported} ({rows} rows).")
+            if self.options["optimize"]:
+                self.alert("Batched imports are not optimized, as it needs "
+                           + "the whole dataframe in memory.")
+            return
+        self.dataframe = self.import_files("jsonl" if lines else "json",
+                                           files, source, **kwargs)
+        if self.options["optimize"]:
+            self.optimize_dataframe()
         self.save_dataframe()
-        self.output(f"Imported '{filename}'.")
+        self.output(f"Imported {imported}.")
@@ -9,7 +9,7 @@ class Module(BaseModule, ProcessingMixin):
     meta = {
         "name": "BBcode removal",
         "author": "Jan William Johnsen (@frozenbeer)",
-        "version": "1.1",
+        "version": "1.2",
         "description": "Removes BBcode from text.",
         "options": (
             ("column", "", True, "column(s) to use, separate with comma"),
@@ -18,7 +18,7 @@ class Module(BaseModule, ProcessingMixin):
         ),
     }
 
-    def module_run(self):
+    def stage(self):
         # uses regex ".+?" to remove in a non-greedy way.
         patterns = [
             r"\[quote.+?\[\/quote\]?", r"\[url=?.+?\[\/url\]",
@@ -33,7 +33,6 @@ class Module(BaseModule, ProcessingMixin):
             r"\[hr\]", r"\[member=?.+?\]", r"\[background=?.+?\]",
             r"\[\/background\]", r"\[center\]", r"\[\/center\]", r"\[\*\]",
         ]
-        columns = []
         if not self.options["bbcodes"]:
             df_bbcodes = pd.read_json(
                 os.path.join(self.data_path, "stopwords", "bbcodes.json")
@@ -41,11 +40,7 @@ class Module(BaseModule, ProcessingMixin):
         else:
             df_bbcodes = pd.read_json(self.options["bbcodes"])
         tags = df_bbcodes["word"].to_list()
-        if "," in self.options["column"]:
-            columns = self.options["column"].replace(" ", "").split(",")
-        else:
-            columns = [self.options["column"]]
-        for column in columns:
-            self.dataframe[column] = self.processes(
-                process, self.dataframe[column], tags + patterns
-            )
+        return process, (tags + patterns,)
+
+    def module_run(self):
+        self.process_stage()
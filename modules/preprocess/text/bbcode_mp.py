@@ -1,8 +1,18 @@
+import re
+
+
+def prepare(tags):
+    return (re.compile(r"|".join(tags)),)
+
+
 def process(*args):
     data = args[0]
-    tags = args[1]
+    pattern = args[1]
     # remove BBcode tags
-    data = data.str.replace(r"|".join(tags), r" ")
+    data = data.str.replace(pattern, r" ", regex=True)
     # remove extra whitespace
-    data = data.str.replace(r"\s{2,}", r" ")
+    data = data.str.replace(r"\s{2,}", r" ", regex=True)
     return data
+
+
+process.prepare = prepare
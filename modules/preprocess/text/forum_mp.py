@@ -1,14 +1,24 @@
+import re
+
+
+def prepare(patterns):
+    return (re.compile(r"|".join(patterns)),)
+
+
 def process(*args):
     data = args[0]
-    patterns = args[1]
+    pattern = args[1]
     # remove URLs
-    data = data.str.replace(r"http[s]?:\/\/(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+", r" ")
+    data = data.str.replace(r"http[s]?:\/\/(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+", r" ", regex=True)
     # remove e-mail address:password combination
-    data = data.str.replace(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+:[a-zA-Z0-9]+", r" ")
+    data = data.str.replace(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+:[a-zA-Z0-9]+", r" ", regex=True)
     # remove e-mails
-    data = data.str.replace(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", r" ")
+    data = data.str.replace(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+", r" ", regex=True)
     # remove emojies (typically emoticons like :hype:, :fiesta:, etc.)
-    data = data.str.replace(r"|".join(patterns), r" ")
+    data = data.str.replace(pattern, r" ", regex=True)
     # remove extra whitespace
-    data = data.str.replace(r"\s{2,}", r" ")
+    data = data.str.replace(r"\s{2,}", r" ", regex=True)
     return data
+
+
+process.prepare = prepare
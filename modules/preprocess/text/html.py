@@ -7,20 +7,15 @@ class Module(BaseModule, ProcessingMixin):
     meta = {
         "name": "HTML tags & entities removal",
         "author": "Jan William Johnsen (@frozenbeer)",
-        "version": "1.1",
+        "version": "1.2",
         "description": "Remove HTML tags and entities in specified column(s).",
         "options": (
             ("column", "", True, "column(s) to use, separate with comma"),
         ),
     }
 
+    def stage(self):
+        return process, ()
+
     def module_run(self):
-        columns = []
-        if "," in self.options["column"]:
-            columns = self.options["column"].replace(" ", "").split(",")
-        else:
-            columns = [self.options["column"]]
-        for column in columns:
-            self.dataframe[column] = self.processes(
-                process, self.dataframe[column]
-            )
+        self.process_stage()
@@ -1,9 +1,9 @@
 def process(*args):
     data = args[0]
     # remove HTML tags (incl. its contents)
-    data = data.str.replace(r"<[^>]*>", r" ")
+    data = data.str.replace(r"<[^>]*>", r" ", regex=True)
     # remove HTML entities (e.g. "&nbsp;")
-    data = data.str.replace(r"&[^\s]*;", r" ")
+    data = data.str.replace(r"&[^\s]*;", r" ", regex=True)
     # remove extra whitespace
-    data = data.str.replace(r"\s{2,}", r" ")
+    data = data.str.replace(r"\s{2,}", r" ", regex=True)
     return data
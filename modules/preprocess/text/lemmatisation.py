@@ -7,7 +7,7 @@ class Module(BaseModule, ProcessingMixin):
     meta = {
         "name": "Lemmatisation",
         "author": "Jan William Johnsen (@frozenbeer)",
-        "version": "1.2",
+        "version": "1.3",
         "description": "Lemmatise specified column(s).",
         "options": (
             ("column", "", True, ("column(s) to lemmatise, "
@@ -15,13 +15,8 @@ class Module(BaseModule, ProcessingMixin):
         ),
     }
 
+    def stage(self):
+        return process, ()
+
     def module_run(self):
-        columns = []
-        if "," in self.options["column"]:
-            columns = self.options["column"].replace(" ", "").split(",")
-        else:
-            columns = [self.options["column"]]
-        for column in columns:
-            self.dataframe[column] = self.processes(
-                process, self.dataframe[column]
-            )
+        self.process_stage()
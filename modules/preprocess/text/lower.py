@@ -7,7 +7,7 @@ class Module(BaseModule, ProcessingMixin):
     meta = {
         "name": "Lowercase",
         "author": "Jan William Johnsen (@frozenbeer)",
-        "version": "1.1",
+        "version": "1.2",
         "description": "Set specified column(s) to lowercase.",
         "options": (
             ("column", "", True, ("column(s) to lowercase, "
@@ -15,11 +15,8 @@ class Module(BaseModule, ProcessingMixin):
         ),
     }
 
+    def stage(self):
+        return process, ()
+
     def module_run(self):
-        columns = []
-        if "," in self.options["column"]:
-            columns = self.options["column"].replace(" ", "").split(",")
-        else:
-            columns = [self.options["column"]]
-        for column in columns:
-            self.dataframe[column] = process(self.dataframe[column])
+        self.process_stage()
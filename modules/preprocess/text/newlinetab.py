@@ -7,7 +7,7 @@ class Module(BaseModule, ProcessingMixin):
     meta = {
         "name": "Newline and tabular characters removal",
         "author": "Jan William Johnsen (@frozenbeer)",
-        "version": "1.1",
+        "version": "1.2",
         "description": ("Remove newline and tabular characters from specified "
                         + "column(s)."),
         "options": (
@@ -15,13 +15,8 @@ class Module(BaseModule, ProcessingMixin):
         ),
     }
 
+    def stage(self):
+        return process, ()
+
     def module_run(self):
-        columns = []
-        if "," in self.options["column"]:
-            columns = self.options["column"].replace(" ", "").split(",")
-        else:
-            columns = [self.options["column"]]
-        for column in columns:
-            self.dataframe[column] = self.processes(
-                process, self.dataframe[column]
-            )
+        self.process_stage()
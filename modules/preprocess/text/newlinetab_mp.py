@@ -1,6 +1,6 @@
 def process(*args):
     data = args[0]
-    data = data.str.replace(r"\n|\t|\r", r" ")
+    data = data.str.replace(r"\n|\t|\r", r" ", regex=True)
     # remove extra whitespace
-    data = data.str.replace(r"\s{2,}", r" ")
+    data = data.str.replace(r"\s{2,}", r" ", regex=True)
     return data
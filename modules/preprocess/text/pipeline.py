@@ -0,0 +1,45 @@
+from core.framework import FrameworkException
+from core.module import BaseModule
+from mixins.processes import ProcessingMixin
+from modules.preprocess.text.pipeline_mp import process
+import os
+
+
+class Module(BaseModule, ProcessingMixin):
+    meta = {
+        "name": "Text preprocessing pipeline",
+        "author": "Jan William Johnsen (@frozenbeer)",
+        "version": "1.0",
+        "description": ("Runs several text preprocessing modules on "
+                        + "specified column(s) in a single pass."),
+        "options": (
+            ("column", "", True, "column(s) to use, separate with comma"),
+            ("stages", ("html,bbcode,forum,newlinetab,lower,symbols,"
+                        + "stopwords,lemmatisation"), True,
+             "modules to run in order, separate with comma"),
+        ),
+    }
+
+    def stages(self):
+        """Returns the process function and arguments of every stage, with
+        the current options of the stage's module"""
+        stages = []
+        for name in self.options["stages"].replace(" ", "").split(","):
+            module = self._loaded_modules.get(name) or \
+                self._loaded_modules.get(
+                    os.path.join("preprocess", "text", name)
+                )
+            if module is self or not hasattr(module, "stage"):
+                raise FrameworkException(
+                    f"Module '{name}' can't be a pipeline stage."
+                )
+            stages.append(module.stage())
+        return stages
+
+    def stage(self):
+        return process, tuple(self.stages())
+
+    def module_run(self):
+        self.process_stage()
+        # one save for all stages
+        self.save_dataframe()
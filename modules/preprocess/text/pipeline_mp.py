@@ -0,0 +1,17 @@
+from mixins.processes import prepare_args
+
+
+def prepare(*stages):
+    # prepare the arguments of every stage once
+    return tuple((func, prepare_args(func, args)) for func, args in stages)
+
+
+def process(*args):
+    data = args[0]
+    # args[1:] are the (process function, arguments) of every stage
+    for func, stage_args in args[1:]:
+        data = func(data, *stage_args)
+    return data
+
+
+process.prepare = prepare
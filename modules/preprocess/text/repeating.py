@@ -22,7 +22,7 @@ class Module(BaseModule, ProcessingMixin):
     }
 
     def extract(self, column):
-        df_rep = processe(self.dataframe[column])
+        df_rep = processe(self.read_column(column))
         df_rep = df_rep.to_frame("word").explode("word").dropna().\
             reset_index(drop=True).groupby("word").size().\
             to_frame(name="size").reset_index()
@@ -110,7 +110,8 @@ class Module(BaseModule, ProcessingMixin):
         original = os.path.join(self.workspace, "repeating_original.csv")
         short = os.path.join(self.workspace, "repeating_short.csv")
         self.processes(
-            processr, self.dataframe[column], original, short, additional_words
+            processr, self.read_column(column), original, short,
+            additional_words
         )
 
     def module_run(self):
@@ -130,7 +131,7 @@ class Module(BaseModule, ProcessingMixin):
         # print out summary of the repeating words and repeating_characters
         total = df_rep_groups["size"].sum()
         groups_top = df_rep_groups[:1000]["size"].sum()
-        df_temp = self.dataframe[column].str.lower().str.split()
+        df_temp = self.read_column(column).str.lower().str.split()
         df_total = df_temp.str.len().sum()
         self.alert("Statistics are incorrect! Suppressing it.")
         self.output("Statistics:")
@@ -72,11 +72,10 @@ def processe(*args):
     return data.apply(run_repeating)
 
 
-def processr(*args):
-    data = args[0]
-    replace_original = pd.read_csv(args[1], sep=";", index_col="index")
-    replace_short = pd.read_csv(args[2], sep=";", index_col="index")
-    additional_words = args[3]
+def prepare_replace(original, short, additional_words):
+    """Builds the lemmatised replacements once for every worker"""
+    replace_original = pd.read_csv(original, sep=";", index_col="index")
+    replace_short = pd.read_csv(short, sep=";", index_col="index")
     replace_original["changed"] = False
     replace_short = replace_short[~(replace_short["replace"].isnull())]
     # word[1][0] = short, word[1][1] = size, word[1][2] = replace
@@ -95,5 +94,17 @@ def processr(*args):
         drop(columns="changed").set_index("word").to_dict()["short"]
     for item in replace_original:
         replace_original[item] = run_lemmatize(replace_original[item])
-    data = data.apply(run_replace_shorten_word, args=(replace_original,))
+    return (replace_original,)
+
+
+def processr(*args):
+    data = args[0]
+    replace_original = args[1]
+    data = data.map(
+        lambda x: run_replace_shorten_word(x, replace_original),
+        na_action="ignore"
+    ).astype(data.dtype)
     return data
+
+
+processr.prepare = prepare_replace
@@ -9,7 +9,7 @@ class Module(BaseModule, ProcessingMixin):
     meta = {
         "name": "Stopword removal",
         "author": "Jan William Johnsen (@frozenbeer)",
-        "version": "1.1",
+        "version": "1.2",
         "description": "Remove stopwords from specified column(s).",
         "options": (
             ("column", "", True, "column(s) to use, separate with comma"),
@@ -17,7 +17,7 @@ class Module(BaseModule, ProcessingMixin):
         ),
     }
 
-    def module_run(self):
+    def stage(self):
         df_sw = pd.read_json(
             os.path.join(self.data_path, "stopwords", "stopwords.json")
         )
@@ -27,14 +27,10 @@ class Module(BaseModule, ProcessingMixin):
         else:
             additional_words = [self.options["stopwords"]]
         additional_words = [{"word": word} for word in additional_words]
-        df_sw = df_sw.append(pd.DataFrame(additional_words), ignore_index=True)
+        df_sw = pd.concat([df_sw, pd.DataFrame(additional_words)],
+                          ignore_index=True)
         stopwords = df_sw["word"].to_list()
-        columns = []
-        if "," in self.options["column"]:
-            columns = self.options["column"].replace(" ", "").split(",")
-        else:
-            columns = [self.options["column"]]
-        for column in columns:
-            self.dataframe[column] = self.processes(
-                process, self.dataframe[column], stopwords
-            )
+        return process, (stopwords,)
+
+    def module_run(self):
+        self.process_stage()
@@ -1,10 +1,23 @@
+from functools import partial
+
+
 def run_stopwords(string="", stopwords=[]):
     return " ".join(
         [word for word in string.split(" ") if word not in stopwords]
     )
 
 
+def prepare(stopwords):
+    return (set(stopwords),)
+
+
 def process(*args):
     data = args[0]
     stopwords = args[1]
-    return data.apply(run_stopwords, args=(stopwords,))
+    # keep missing values and the dtype of the text, e.g. arrow strings
+    return data.map(
+        partial(run_stopwords, stopwords=stopwords), na_action="ignore"
+    ).astype(data.dtype)
+
+
+process.prepare = prepare
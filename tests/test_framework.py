@@ -0,0 +1,52 @@
+import shutil
+import tempfile
+import unittest
+
+from core import framework
+
+
+class InsertManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.framework = framework.Framework.__new__(framework.Framework)
+        self.framework.workspace = tempfile.mkdtemp()
+        self.framework._connections = framework.ConnectionPool()
+        self.framework.debug = lambda message: None
+        self.framework._user_defined = False
+        self.framework._modulename = "test"
+        self.framework._summary_counts = {}
+        self.framework.query(
+            "CREATE TABLE `items` (`a` TEXT, `b` TEXT, `module` TEXT)")
+
+    def tearDown(self):
+        self.framework._connections.close()
+        shutil.rmtree(self.framework.workspace)
+
+    def rows(self):
+        return self.framework.query(
+            "SELECT `a`, `b` FROM `items` ORDER BY rowid")
+
+    def test_duplicates(self):
+        self.framework.insert("items", {"a": "x", "b": "1"})
+        rows = [{"a": "x", "b": "1"}, {"a": "y", "b": "2"},
+                {"a": "y", "b": "2"}, {"a": "y", "b": "3"}]
+        count = self.framework.insert_many("items", rows, ["a", "b"])
+        self.assertEqual(count, 2)
+        self.assertEqual(self.rows(),
+                         [("x", "1"), ("y", "2"), ("y", "3")])
+
+    def test_null_unique_column(self):
+        # empty unique columns are left out of the comparison, as in insert
+        rows = [{"a": "z"}, {"a": "z"}, {"a": "z", "b": "1"}]
+        for row in rows:
+            self.framework.insert("items", row, ["a", "b"])
+        expected = self.rows()
+        self.framework.query("DELETE FROM `items`")
+        count = self.framework.insert_many("items", rows, ["a", "b"])
+        self.assertEqual(count, len(expected))
+        self.assertEqual(self.rows(), expected)
+        self.assertEqual(expected, [("z", None), ("z", "1")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from mixins.processes import ProcessingMixin
+
+
+class BalanceTest(unittest.TestCase):
+
+    def balance(self, costs, n_workers=4, n=16):
+        ranges = list(ProcessingMixin._balance(costs, n_workers, n))
+        # the ranges cover every row once, in order
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(costs))
+        for (_, stop), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(stop, start)
+        return ranges
+
+    def test_uniform(self):
+        costs = np.ones(1000)
+        ranges = self.balance(costs)
+        self.assertGreater(len(ranges), 4)
+        self.assertLessEqual(max(b - a for a, b in ranges), 1000 / 16)
+
+    def test_skewed(self):
+        # a heavy row is a chunk of its own, and the light rows around it
+        # are not added to its chunk or their own chunk's share
+        for heavy in (10, 1000):
+            costs = np.ones(2000)
+            costs[heavy] = 5000.0
+            ranges = self.balance(costs)
+            self.assertIn((heavy, heavy + 1), ranges)
+            limit = costs.sum() / 16
+            for start, stop in ranges:
+                if stop - start > 1:
+                    self.assertLessEqual(costs[start:stop].sum(), limit)
+
+    def test_skewed_first(self):
+        costs = np.append(1000.0, np.ones(1000))
+        ranges = self.balance(costs)
+        self.assertEqual(ranges[0], (0, 1))
+        self.assertGreater(len(ranges), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()